@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from ...core.security import create_access_token, pwd_context
+from ...core.security import create_access_token, verify_password
+from ...core.config import settings
 from ...models.user import User
 from sqlalchemy.orm import Session
 from ...core.database import get_db
@@ -16,7 +17,7 @@ async def login(
     # Here you would verify user credentials against database
     # This is a simplified example
     user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not pwd_context.verify(form_data.password, user.hashed_password):
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -1,46 +1,57 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from ...services.voice_processor import VoiceProcessor
-from ...services.ai_engine import AIEngine
-from ...services.task_executor import TaskExecutor, TaskType
+from ...services.container import ServiceContainer, get_services
+from ...services.pipeline import dispatch_command, reply_message, CommandFailed
 from typing import Optional
 from ...core.security import get_current_user
+from ...core.metrics import IN_FLIGHT, stage
+from ...core.rate_limit import admission, RateLimited
+import math
 
 router = APIRouter()
-voice_processor = VoiceProcessor()
-ai_engine = AIEngine()
-task_executor = TaskExecutor()
 
 @router.post("/process-voice")
 async def process_voice_command(
     audio_file: UploadFile = File(...),
-    current_user: int = Depends(get_current_user)
+    current_user: int = Depends(get_current_user),
+    services: ServiceContainer = Depends(get_services)
+):
+    with IN_FLIGHT.track(pipeline="voice"):
+        return await _process_voice_command(audio_file, current_user, services)
+
+async def _process_voice_command(
+    audio_file: UploadFile,
+    current_user: int,
+    services: ServiceContainer
 ):
     try:
+        admission.admit_user(current_user)
+
         # Read audio file
         audio_content = await audio_file.read()
         
         # Transcribe audio to text
-        transcription = await voice_processor.transcribe_audio(audio_content)
+        with stage("voice", "transcribe"):
+            transcription = await services.voice_processor.transcribe_audio(audio_content)
         if transcription["status"] != "success":
             raise HTTPException(status_code=400, detail="Failed to transcribe audio")
             
-        # Process command through AI engine
-        ai_response = await ai_engine.process_command(transcription["text"])
-        if ai_response["status"] != "success":
+        with stage("voice", "context_fetch"):
+            user_context = await services.context_manager.get_user_context(current_user)
+
+        try:
+            task_result = await dispatch_command(
+                services,
+                "voice",
+                transcription["text"],
+                current_user,
+                user_context
+            )
+        except CommandFailed:
             raise HTTPException(status_code=400, detail="Failed to process command")
-            
-        # Execute identified task
-        task_result = await task_executor.execute_task(
-            TaskType(ai_response["task_identified"]),
-            {
-                "command": transcription["text"],
-                "user_id": current_user,
-                "user_context": await get_user_context(current_user)
-            }
-        )
         
         # Generate voice response
-        audio_response = await voice_processor.text_to_speech(task_result["result"]["message"])
+        with stage("voice", "tts"):
+            audio_response = await services.voice_processor.text_to_speech(reply_message(task_result))
         
         return {
             "status": "success",
@@ -49,5 +60,13 @@ async def process_voice_command(
             "audio_response": audio_response
         }
         
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
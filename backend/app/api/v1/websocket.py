@@ -1,65 +1,77 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import Dict, List
-import json
+from typing import Dict, List, Any
 from ...core.security import get_current_user
-from ...services.ai_engine import AIEngine
-from ...services.task_executor import TaskExecutor, TaskType
-from ...services.user_context import UserContextManager
+from ...core.ws_protocol import ProtocolSocket
+from ...core.metrics import IN_FLIGHT, stage
+from ...core.rate_limit import admission, RateLimited
+from ...services.container import services
+from ...services.pipeline import dispatch_command, CommandFailed
 
 router = APIRouter()
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[int, List[WebSocket]] = {}
-        self.ai_engine = AIEngine()
-        self.task_executor = TaskExecutor()
-        self.context_manager = UserContextManager()
+        self.active_connections: Dict[int, List[ProtocolSocket]] = {}
+        self.services = services
+        self.services.on_task_result(self.deliver_task_result)
 
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
+    async def connect(self, websocket: WebSocket, user_id: int) -> ProtocolSocket:
+        connection = await ProtocolSocket.accept(websocket)
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
-        self.active_connections[user_id].append(websocket)
+        self.active_connections[user_id].append(connection)
+        return connection
 
-    async def disconnect(self, websocket: WebSocket, user_id: int):
-        self.active_connections[user_id].remove(websocket)
+    async def disconnect(self, connection: ProtocolSocket, user_id: int):
+        self.active_connections[user_id].remove(connection)
         if not self.active_connections[user_id]:
             del self.active_connections[user_id]
 
-    async def send_personal_message(self, message: str, user_id: int):
+    async def send_personal_message(self, message: Dict[str, Any], user_id: int):
         if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                await connection.send_text(json.dumps({
+            for connection in list(self.active_connections[user_id]):
+                await connection.send({
                     "type": "message",
                     "content": message
-                }))
+                })
+
+    async def deliver_task_result(self, user_id: int, result: dict):
+        """Push the result of a queued task to the user's connections"""
+        await self.send_personal_message(result, user_id)
 
     async def process_command(self, command: dict, user_id: int):
+        with IN_FLIGHT.track(pipeline="websocket"):
+            return await self._process_command(command, user_id)
+
+    async def _process_command(self, command: dict, user_id: int):
         # Get user context for AI personalization
-        user_context = await self.context_manager.get_user_context(user_id)
+        with stage("websocket", "context_fetch"):
+            user_context = await self.services.context_manager.get_user_context(user_id)
         
-        # Process command through AI engine
-        ai_response = await self.ai_engine.process_command(
-            command["text"],
-            context=user_context
-        )
-        
-        # Execute task and get response
-        task_result = await self.task_executor.execute_task(
-            TaskType(ai_response["task_identified"]),
-            {
-                "command": command["text"],
-                "user_id": user_id,
-                "context": user_context
+        try:
+            # Long running work is answered later through deliver_task_result
+            task_result = await dispatch_command(
+                self.services,
+                "websocket",
+                command["text"],
+                user_id,
+                user_context,
+                defer_long_tasks=True
+            )
+        except CommandFailed as e:
+            return {
+                "status": "error",
+                "error": e.error,
+                "error_type": e.error_type
             }
-        )
         
         # Update user context with new interaction
-        await self.context_manager.update_context(
-            user_id,
-            command["text"],
-            task_result
-        )
+        with stage("websocket", "context_write"):
+            await self.services.context_manager.update_context(
+                user_id,
+                command["text"],
+                task_result
+            )
         
         return task_result
 
@@ -78,24 +90,35 @@ async def websocket_endpoint(
             await websocket.close(code=4001)
             return
             
-        await manager.connect(websocket, user_id)
+        connection = await manager.connect(websocket, user_id)
         
         try:
             while True:
-                data = await websocket.receive_text()
-                command = json.loads(data)
+                command = await connection.receive()
+                if command.get("type") == "ping":
+                    await connection.send({"type": "pong"})
+                    continue
                 
-                # Process the command
-                response = await manager.process_command(command, user_id)
+                # Process the command, answering at once when over the limits
+                try:
+                    admission.admit_user(user_id)
+                    response = await manager.process_command(command, user_id)
+                except RateLimited as e:
+                    await connection.send({
+                        "type": "error",
+                        "code": 429,
+                        "message": "busy",
+                        "retry_after": round(e.retry_after, 2)
+                    })
+                    continue
                 
                 # Send response back to user
-                await manager.send_personal_message(
-                    json.dumps(response),
-                    user_id
-                )
+                await manager.send_personal_message(response, user_id)
                 
         except WebSocketDisconnect:
-            await manager.disconnect(websocket, user_id)
+            pass
+        finally:
+            await manager.disconnect(connection, user_id)
             
     except Exception as e:
         await websocket.close(code=4000) 
\ No newline at end of file
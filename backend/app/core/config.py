@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -12,9 +13,24 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 256
+    TOKEN_CACHE_SIZE: int = 10000
     
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+    OPENAI_BASE_URL: Optional[str] = os.getenv("OPENAI_BASE_URL")
+
+    # Model routing, short commands go to the fast model first
+    AI_PRIMARY_MODEL: str = "gpt-4"
+    AI_FAST_MODEL: str = "gpt-3.5-turbo"
+    AI_FAST_MAX_WORDS: int = 12
+    AI_REQUEST_TIMEOUT: float = 15.0
+    AI_HEDGE_QUANTILE: float = 0.95
+    AI_HEDGE_DEFAULT_DELAY: float = 2.0
+    AI_HEDGE_MIN_DELAY: float = 0.1
+    AI_BREAKER_FAILURES: int = 5
+    AI_BREAKER_RESET: float = 30.0
     
     # Firebase
     FIREBASE_CREDENTIALS: str = os.getenv("FIREBASE_CREDENTIALS")
@@ -24,6 +40,60 @@ class Settings(BaseSettings):
     
     # Voice Processing
     WHISPER_API_KEY: str = os.getenv("WHISPER_API_KEY")
+    TTS_MODEL: str = "tts-1"
+    TTS_VOICE: str = "alloy"
+    TTS_CACHE_DIR: str = os.getenv("TTS_CACHE_DIR", ".cache/tts")
+    TTS_CACHE_MEMORY_BYTES: int = 32 * 1024 * 1024
+    TTS_CACHE_DISK_BYTES: int = 512 * 1024 * 1024
+    TTS_CACHE_PREWARM: bool = True
+
+    # Smart Home
+    MQTT_BROKER: str = os.getenv("MQTT_BROKER", "localhost")
+    MQTT_PORT: int = 1883
+    MQTT_USERNAME: Optional[str] = os.getenv("MQTT_USERNAME")
+    MQTT_PASSWORD: Optional[str] = os.getenv("MQTT_PASSWORD")
+    COMMAND_RULES_FILE: Optional[str] = os.getenv("COMMAND_RULES_FILE")
+
+    # WebSocket protocol
+    WS_COMPRESSION_THRESHOLD: int = 1024
+    WS_COMPRESSION_LEVEL: int = 6
+
+    # Admission control, rates are requests per second
+    USER_RATE_LIMIT: float = 1.0
+    USER_RATE_BURST: int = 10
+    OPENAI_RATE_LIMIT: float = 50.0
+    OPENAI_RATE_BURST: int = 100
+    OPENAI_MAX_CONCURRENCY: int = 64
+    OPENAI_TARGET_LATENCY: float = 5.0
+    MQTT_RATE_LIMIT: float = 100.0
+    MQTT_RATE_BURST: int = 200
+    MQTT_MAX_CONCURRENCY: int = 64
+    MQTT_TARGET_LATENCY: float = 1.0
+    UPSTREAM_MAX_QUEUE: int = 256
+    UPSTREAM_MAX_WAIT: float = 10.0
+
+    # Monitoring
+    HEALTH_CHECK_TIMEOUT: float = 2.0
+    # Seconds a model upstream probe result is reused across health checks
+    HEALTH_UPSTREAM_CACHE_TTL: float = 5.0
+
+    # Task Queue
+    TASK_QUEUE_DB: Optional[str] = os.getenv("TASK_QUEUE_DB", "task_queue.db")
+    TASK_QUEUE_WORKERS: int = 32
+    TASK_QUEUE_PROCESS_WORKERS: int = 2
+    TASK_RECOVERY_INTERVAL: float = 10.0
+    TASK_OWNER_TIMEOUT: float = 30.0
+
+    # Shortcuts
+    SHORTCUT_CACHE_SIZE: int = 10000
+
+    # Interaction Log
+    INTERACTION_LOG_BATCH_SIZE: int = 200
+    INTERACTION_LOG_FLUSH_INTERVAL: float = 1.0
+    INTERACTION_LOG_MAX_PENDING: int = 10000
+    INTERACTION_RETENTION_DAYS: int = 90
+    INTERACTION_RETENTION_INTERVAL: float = 3600.0
+    INTERACTION_RETENTION_BATCH: int = 5000
 
     class Config:
         case_sensitive = True
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from ..core.config import settings
@@ -10,6 +10,11 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def ping_database():
+    """Raise if a pooled connection can't run a trivial query"""
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,234 @@
+from typing import Dict, Optional, List, Tuple, Hashable
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import heapq
+import itertools
+import time
+from .config import settings
+from .metrics import registry
+
+# Priority lanes, lower runs first
+PRIORITY_DEVICE = 0
+PRIORITY_CHAT = 1
+
+RATE_LIMITED = registry.counter(
+    "qia_rate_limited_total",
+    "Requests rejected by admission control",
+    ["scope"]
+)
+UPSTREAM_CONCURRENCY_LIMIT = registry.gauge(
+    "qia_upstream_concurrency_limit",
+    "Current adaptive concurrency limit per upstream",
+    ["upstream"]
+)
+
+
+class RateLimited(Exception):
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Rate limited: {scope}")
+        self.scope = scope
+        self.retry_after = max(retry_after, 0.0)
+        RATE_LIMITED.inc(scope=scope)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def retry_after(self, tokens: float = 1) -> float:
+        self._refill()
+        if self.rate <= 0:
+            return float("inf")
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+class KeyedTokenBuckets:
+    """
+    One token bucket per key, keeping only the most recently used keys
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    def try_acquire(self, key: Hashable, scope: str) -> None:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+            # A dropped key comes back with a full bucket, which is its steady state
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+
+        if not bucket.try_acquire():
+            raise RateLimited(scope, bucket.retry_after())
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one upstream.
+
+    The limit grows by roughly one slot per round trip while calls succeed
+    within target_latency, and is cut multiplicatively when the upstream
+    signals overload (429s) or gets slower. Waiters are served by priority
+    lane; once max_queue callers are waiting, new ones are rejected at once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maximum: int,
+        target_latency: float,
+        max_queue: int,
+        max_wait: float,
+        minimum: int = 1,
+        backoff: float = 0.7
+    ):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.backoff = backoff
+
+        self.limit = float(max(minimum, maximum // 4))
+        self.in_flight = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._last_decrease = 0.0
+        UPSTREAM_CONCURRENCY_LIMIT.set(self.limit, upstream=name)
+
+    async def acquire(self, priority: int) -> None:
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            return
+
+        if len(self.waiters) >= self.max_queue:
+            raise RateLimited(self.name, self.target_latency)
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), waiter)
+        heapq.heappush(self.waiters, entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # Granted a slot just as we gave up, hand it on
+                self.in_flight -= 1
+                self._wake()
+            else:
+                waiter.cancel()
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+            if isinstance(e, asyncio.TimeoutError):
+                raise RateLimited(self.name, self.target_latency)
+            raise
+
+    def release(self, latency: float, overloaded: bool = False) -> None:
+        self.in_flight -= 1
+
+        now = time.monotonic()
+        if overloaded or latency > self.target_latency:
+            # Back off at most once per target_latency so one burst isn't counted many times
+            if now - self._last_decrease > self.target_latency:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        UPSTREAM_CONCURRENCY_LIMIT.set(round(self.limit, 2), upstream=self.name)
+
+        self._wake()
+
+    def _wake(self) -> None:
+        while self.waiters and self.in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self.waiters)
+            self.in_flight += 1
+            waiter.set_result(None)
+
+
+class UpstreamSlot:
+    def __init__(self):
+        self.overloaded = False
+
+    def mark_overloaded(self) -> None:
+        """Report that the upstream pushed back, e.g. answered 429"""
+        self.overloaded = True
+
+
+class AdmissionController:
+    """
+    Per-user and per-upstream limits shared by the whole worker
+    """
+
+    def __init__(self):
+        self.users = KeyedTokenBuckets(settings.USER_RATE_LIMIT, settings.USER_RATE_BURST)
+        self.quotas: Dict[str, TokenBucket] = {
+            "openai": TokenBucket(settings.OPENAI_RATE_LIMIT, settings.OPENAI_RATE_BURST),
+            "mqtt": TokenBucket(settings.MQTT_RATE_LIMIT, settings.MQTT_RATE_BURST)
+        }
+        self.limiters: Dict[str, AdaptiveLimiter] = {
+            "openai": AdaptiveLimiter(
+                "openai",
+                maximum=settings.OPENAI_MAX_CONCURRENCY,
+                target_latency=settings.OPENAI_TARGET_LATENCY,
+                max_queue=settings.UPSTREAM_MAX_QUEUE,
+                max_wait=settings.UPSTREAM_MAX_WAIT
+            ),
+            "mqtt": AdaptiveLimiter(
+                "mqtt",
+                maximum=settings.MQTT_MAX_CONCURRENCY,
+                target_latency=settings.MQTT_TARGET_LATENCY,
+                max_queue=settings.UPSTREAM_MAX_QUEUE,
+                max_wait=settings.UPSTREAM_MAX_WAIT
+            )
+        }
+
+    def saturated(self, name: str) -> bool:
+        """True while callers are queued for a slot on the upstream"""
+        return bool(self.limiters[name].waiters)
+
+    def admit_user(self, user_id: Optional[int]) -> None:
+        """Raise RateLimited if the user is over their command rate"""
+        self.users.try_acquire(str(user_id), "user")
+
+    @asynccontextmanager
+    async def upstream(self, name: str, priority: int = PRIORITY_CHAT):
+        """
+        Hold a slot on an upstream for the duration of one call
+        """
+        quota = self.quotas[name]
+        if not quota.try_acquire():
+            raise RateLimited(name, quota.retry_after())
+
+        limiter = self.limiters[name]
+        await limiter.acquire(priority)
+
+        slot = UpstreamSlot()
+        start = time.monotonic()
+        try:
+            yield slot
+        finally:
+            limiter.release(time.monotonic() - start, slot.overloaded)
+
+
+admission = AdmissionController()
@@ -1,5 +1,10 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -9,6 +14,83 @@ from ..core.config import settings
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# The bcrypt backend releases the GIL, so a small thread pool keeps it off
+# the event loop; without the bcrypt package passlib falls back to os_crypt,
+# which holds it
+password_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+password_slots = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+password_waiting = 0
+
+class TokenCache:
+    """
+    Small LRU of already verified tokens, keyed by token hash and dropped
+    once the token's exp has passed
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[str]:
+        key = self._key(token)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        user_id, expires_at = entry
+        if expires_at <= time.time():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return user_id
+
+    def set(self, token: str, user_id: str, expires_at: float) -> None:
+        if self.max_size <= 0:
+            return
+
+        key = self._key(token)
+        self.entries[key] = (user_id, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
+
+async def _run_password_task(func, *args):
+    """
+    Run a bcrypt call on the password pool, rejecting early once too many
+    callers are already waiting for a slot
+    """
+    global password_waiting
+    if password_waiting >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+    password_waiting += 1
+    try:
+        async with password_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(password_pool, func, *args)
+    finally:
+        password_waiting -= 1
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_task(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    return await _run_password_task(pwd_context.hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -29,6 +111,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
     try:
         payload = jwt.decode(
             token, 
@@ -40,6 +126,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+
+    # Tokens always carry exp, see create_access_token
+    if payload.get("exp") is not None:
+        token_cache.set(token, user_id, float(payload["exp"]))
     
     # Here you would typically fetch the user from database
     # For now, returning the user_id
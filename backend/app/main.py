@@ -1,8 +1,23 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 import json
+from .core.config import settings
+from .core.metrics import registry
+from .services.container import services
+from .api.v1 import auth, voice_commands, websocket
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared services for this worker, connections are opened in the background
+    await services.startup()
+    try:
+        yield
+    finally:
+        await services.shutdown()
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -13,6 +28,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(auth.router, prefix=settings.API_V1_STR)
+app.include_router(voice_commands.router, prefix=settings.API_V1_STR)
+app.include_router(websocket.router, prefix=settings.API_V1_STR)
+
 # Store active connections
 class ConnectionManager:
     def __init__(self):
@@ -58,11 +77,14 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "services": {
-            "ai_engine": "operational",
-            "voice_processor": "operational",
-            "database": "connected"
-        }
-    } 
\ No newline at end of file
+    health = await services.health()
+    # Degraded upstreams are reported in the body but keep the worker ready
+    status_code = 503 if health["status"] == "unhealthy" else 200
+    return JSONResponse(health, status_code=status_code)
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4"
+    ) 
\ No newline at end of file
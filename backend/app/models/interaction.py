@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
+from datetime import datetime
+from .user import Base
+
+class Interaction(Base):
+    """
+    One command and its result. Rows are only ever inserted, and removed
+    in bulk once they fall out of the retention window.
+    """
+    __tablename__ = "interactions"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    command = Column(String)
+    task_type = Column(String)
+    status = Column(String)
+    result = Column(JSON)
+
+    __table_args__ = (
+        # "Last N for user" and retention both walk these in time order
+        Index("ix_interactions_user_created", "user_id", "created_at"),
+        Index("ix_interactions_created", "created_at"),
+    )
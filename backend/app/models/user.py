@@ -16,6 +16,5 @@ class User(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # AI learning data
-    interaction_history = Column(JSON, default=dict)
     frequently_used_commands = Column(JSON, default=dict)
     custom_shortcuts = Column(JSON, default=dict) 
\ No newline at end of file
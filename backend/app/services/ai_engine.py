@@ -1,11 +1,78 @@
-from openai import OpenAI
+from openai import (
+    AsyncOpenAI,
+    RateLimitError,
+    APIConnectionError,
+    APITimeoutError,
+    APIStatusError
+)
 from ..core.config import settings
-from typing import Dict, Any
+from ..core.metrics import UPSTREAM_ERRORS
+from ..core.rate_limit import admission, RateLimited, PRIORITY_DEVICE, PRIORITY_CHAT
+from .command_rules import CommandRules
+from .task_executor import TaskType
+from .single_flight import SingleFlight
+from .model_router import LatencyTracker, CircuitBreaker, LLM_REQUESTS
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import asyncio
+import hashlib
 import json
+import time
+
+# Replies that suggest the fast model is out of its depth
+LOW_CONFIDENCE_PHRASES = (
+    "i'm not sure",
+    "i am not sure",
+    "i don't know",
+    "i do not know",
+    "i'm unable",
+    "i am unable",
+    "could you clarify",
+    "can you clarify"
+)
+
+# Failures that say the upstream is unhealthy rather than the request bad
+UNAVAILABLE_ERRORS = ("timeout", "connection", "rate_limited", "upstream_error")
+# Failures worth an immediate second request; a 429 or a bad request is not
+RETRYABLE_ERRORS = ("timeout", "connection", "upstream_error")
+
+DEGRADED_DEVICE_MESSAGE = "Okay, sending that to your device."
+DEGRADED_GENERAL_MESSAGE = (
+    "I can't reach my language service right now, "
+    "but device commands still work."
+)
+
+
+def _discard_result(task: asyncio.Future) -> None:
+    """Read a leftover attempt's error so it isn't logged as never retrieved"""
+    if not task.cancelled():
+        task.exception()
+
 
 class AIEngine:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            timeout=settings.AI_REQUEST_TIMEOUT,
+            # Retries are done here, by hedging, not with SDK backoff
+            max_retries=0
+        )
+        self.command_rules = CommandRules.load(settings.COMMAND_RULES_FILE)
+        self.single_flight = SingleFlight("chat")
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.breaker = CircuitBreaker(
+            settings.AI_BREAKER_FAILURES,
+            settings.AI_BREAKER_RESET
+        )
+
+    async def close(self):
+        """Close the upstream HTTP connection pool"""
+        await self.client.close()
+
+    async def ping(self) -> None:
+        """Raise if the model upstream can't be reached"""
+        await self.client.models.list()
 
     async def process_command(
         self,
@@ -15,34 +82,256 @@ class AIEngine:
         """
         Process natural language commands using GPT-4 with context
         """
+        # Build system message with context
+        system_message = self._build_system_message(context)
+
+        # Identical commands with an identical prompt share one upstream call
+        key = (
+            " ".join(command.lower().split()).strip(" .!?"),
+            hashlib.sha256(system_message.encode()).hexdigest()
+        )
+        result = await self.single_flight.do(
+            key,
+            lambda: self._complete(command, system_message, context)
+        )
+        return dict(result)
+
+    async def _complete(
+        self,
+        command: str,
+        system_message: str,
+        context: Dict[str, Any] = None
+    ) -> dict:
+        """
+        Route the command to a model, escalating weak answers from the fast
+        model to the primary one, and answer locally while the upstream is down
+        """
+        is_device_command = (
+            self._identify_task(command, "", context) == TaskType.SMART_HOME.value
+        )
+        # Device commands get ahead of chat when the upstream is saturated
+        priority = PRIORITY_DEVICE if is_device_command else PRIORITY_CHAT
+
+        if not self.breaker.allow():
+            return self._degraded_response(command, context, "circuit_open")
+
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": command}
+        ]
+        deadline = time.monotonic() + settings.AI_REQUEST_TIMEOUT
+        model = self._route(command, is_device_command)
+
         try:
-            # Build system message with context
-            system_message = self._build_system_message(context)
-            
-            response = await self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": command}
-                ],
-                temperature=0.7,
-                max_tokens=150
-            )
-            
-            return {
-                "status": "success",
-                "response": response.choices[0].message.content,
-                "task_identified": self._identify_task(
-                    response.choices[0].message.content,
-                    context
-                )
-            }
+            response = await self._hedged(model, messages, priority, deadline)
+            if model != settings.AI_PRIMARY_MODEL and self._low_confidence(response):
+                try:
+                    response = await self._hedged(
+                        settings.AI_PRIMARY_MODEL, messages, priority, deadline
+                    )
+                    model = settings.AI_PRIMARY_MODEL
+                except RateLimited:
+                    pass
+                except Exception:
+                    # The weak answer is still better than none
+                    UPSTREAM_ERRORS.inc(upstream="openai", operation="chat")
+        except RateLimited:
+            raise
         except Exception as e:
+            UPSTREAM_ERRORS.inc(upstream="openai", operation="chat")
+            error_type = self._error_type(e)
+            if error_type in UNAVAILABLE_ERRORS:
+                self.breaker.record_failure()
+                return self._degraded_response(command, context, error_type)
             return {
                 "status": "error",
-                "error": str(e)
+                "error": str(e),
+                "error_type": error_type
             }
 
+        self.breaker.record_success()
+        content = response.choices[0].message.content
+        return {
+            "status": "success",
+            "response": content,
+            "task_identified": self._identify_task(command, content, context),
+            "model": model
+        }
+
+    def _route(self, command: str, is_device_command: bool) -> str:
+        if is_device_command or len(command.split()) <= settings.AI_FAST_MAX_WORDS:
+            return settings.AI_FAST_MODEL
+        return settings.AI_PRIMARY_MODEL
+
+    def _low_confidence(self, response) -> bool:
+        choice = response.choices[0]
+        content = (choice.message.content or "").strip().lower()
+        if not content or choice.finish_reason == "length":
+            return True
+        return any(phrase in content for phrase in LOW_CONFIDENCE_PHRASES)
+
+    def _hedge_delay(self, model: str) -> float:
+        tracker = self.latency.get(model)
+        delay = tracker.quantile(settings.AI_HEDGE_QUANTILE) if tracker else None
+        if delay is None:
+            delay = settings.AI_HEDGE_DEFAULT_DELAY
+        return max(settings.AI_HEDGE_MIN_DELAY, delay)
+
+    async def _hedged(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        priority: int,
+        deadline: float
+    ):
+        """
+        Call the model, sending one backup request if the first one is
+        slower than the model's recent p95 or fails with a timeout,
+        connection or 5xx error. The first successful answer wins and the
+        other request is cancelled.
+
+        The hedge delay counts from when the first call gets its upstream
+        slot, and no backup is sent while other callers wait for a slot:
+        a saturated limiter is not helped by doubling its queue.
+        """
+        granted = asyncio.Event()
+        pending = {asyncio.ensure_future(
+            self._attempt(model, messages, priority, "primary", granted)
+        )}
+        granted_wait = asyncio.ensure_future(granted.wait())
+        hedge_at: Optional[float] = None
+        hedged = False
+        error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    raise asyncio.TimeoutError()
+                if granted.is_set() and hedge_at is None:
+                    hedge_at = now + self._hedge_delay(model)
+
+                waiting = set(pending)
+                if not granted.is_set():
+                    waiting.add(granted_wait)
+                wake_at = deadline if hedged or hedge_at is None else min(deadline, hedge_at)
+                done, _ = await asyncio.wait(
+                    waiting,
+                    timeout=max(0.0, wake_at - now),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                failed = False
+                for task in done & pending:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                    failed = True
+
+                # Hedge on a slow call, or retry at once after a transient
+                # failure. With callers queued the chance is spent without
+                # a request
+                slow = hedge_at is not None and time.monotonic() >= hedge_at
+                retryable = error is None or self._error_type(error) in RETRYABLE_ERRORS
+                if not hedged and (failed or slow) and retryable:
+                    hedged = True
+                    if not admission.saturated("openai"):
+                        pending.add(asyncio.ensure_future(
+                            self._attempt(model, messages, priority, "hedge")
+                        ))
+            raise error
+        finally:
+            granted_wait.cancel()
+            for task in pending:
+                task.add_done_callback(_discard_result)
+                task.cancel()
+
+    async def _attempt(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        priority: int,
+        attempt: str,
+        granted: Optional[asyncio.Event] = None
+    ):
+        outcome = "error"
+        try:
+            async with admission.upstream("openai", priority) as slot:
+                # Time the upstream only, not the wait for a slot
+                start = time.monotonic()
+                if granted:
+                    granted.set()
+                try:
+                    response = await self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=150
+                    )
+                except RateLimitError:
+                    slot.mark_overloaded()
+                    raise
+                latency = time.monotonic() - start
+            outcome = "success"
+            self.latency.setdefault(model, LatencyTracker()).observe(latency)
+            return response
+        except RateLimited:
+            outcome = "rejected"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_REQUESTS.inc(model=model, attempt=attempt, outcome=outcome)
+
+    @staticmethod
+    def _error_type(error: BaseException) -> str:
+        # APITimeoutError is an APIConnectionError, check it first
+        if isinstance(error, (asyncio.TimeoutError, APITimeoutError)):
+            return "timeout"
+        if isinstance(error, RateLimitError):
+            return "rate_limited"
+        if isinstance(error, APIConnectionError):
+            return "connection"
+        if isinstance(error, APIStatusError):
+            return "upstream_error" if error.status_code >= 500 else "bad_request"
+        return "internal"
+
+    @staticmethod
+    def degraded_result(ai_response: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Task result for a degraded answer that has nothing to execute
+        """
+        return {
+            "status": "success",
+            "task_type": ai_response["task_identified"],
+            "result": {"message": ai_response["response"]},
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    def _degraded_response(
+        self,
+        command: str,
+        context: Dict[str, Any],
+        reason: str
+    ) -> dict:
+        """
+        Answer without the model: device commands are still understood by
+        the local rules, anything else gets an apology
+        """
+        task = self._identify_task(command, "", context)
+        if task == TaskType.SMART_HOME.value:
+            message = DEGRADED_DEVICE_MESSAGE
+        else:
+            message = DEGRADED_GENERAL_MESSAGE
+        return {
+            "status": "success",
+            "response": message,
+            "task_identified": task,
+            "degraded": True,
+            "error_type": reason
+        }
+
     def _build_system_message(self, context: Dict[str, Any] = None) -> str:
         """
         Build system message incorporating user context
@@ -56,20 +345,29 @@ class AIEngine:
         context_message = []
         
         if context.get("preferences"):
-            context_message.append("User preferences: " + json.dumps(context["preferences"]))
+            context_message.append("User preferences: " + json.dumps(context["preferences"], default=str))
             
         if context.get("frequently_used_commands"):
-            context_message.append("Common commands: " + json.dumps(context["frequently_used_commands"]))
+            context_message.append("Common commands: " + json.dumps(context["frequently_used_commands"], default=str))
             
         if context.get("recent_interactions"):
             recent = context["recent_interactions"][-3:]  # Last 3 interactions
-            context_message.append("Recent interactions: " + json.dumps(recent))
+            context_message.append("Recent interactions: " + json.dumps(recent, default=str))
             
         return base_message + "\n\nContext:\n" + "\n".join(context_message)
 
-    def _identify_task(self, response: str, context: Dict[str, Any] = None) -> str:
+    def _identify_task(
+        self,
+        command: str,
+        response: str,
+        context: Dict[str, Any] = None
+    ) -> str:
         """
-        Identify the type of task from the AI response
+        Identify the type of task from the command and AI response. Only
+        device commands are recognised, by the local rules; everything
+        else is answered as a general task.
         """
-        # TODO: Implement task classification logic
-        return "general_response" 
\ No newline at end of file
+        device_type, action = self.command_rules.parse(command.lower())
+        if device_type and action:
+            return TaskType.SMART_HOME.value
+        return TaskType.GENERAL.value 
\ No newline at end of file
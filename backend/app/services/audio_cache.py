@@ -0,0 +1,131 @@
+from typing import Optional
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+from ..core.metrics import TTS_CACHE_REQUESTS
+
+
+class AudioCache:
+    """
+    Content addressed cache for synthesized speech.
+
+    Entries are keyed by a hash of (model, voice, text). Hot entries are
+    kept in an in-memory LRU, everything is also written to disk. Both
+    tiers evict least recently used entries once their byte budget is
+    exceeded. get_memory() never blocks; get() and put() do file I/O and
+    belong off the event loop.
+    """
+
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._lock = threading.Lock()
+
+        self.memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_size = 0
+        self.disk: "OrderedDict[str, int]" = OrderedDict()
+        self.disk_size = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def key(text: str, voice: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\0{voice}\0{text}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load_disk_index(self) -> None:
+        """Rebuild the disk LRU from files left by a previous run, oldest first"""
+        entries = []
+        for shard in os.listdir(self.directory):
+            shard_path = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                if name.endswith(".tmp"):
+                    continue
+                stat = os.stat(os.path.join(shard_path, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_size += size
+
+    def get_memory(self, key: str) -> Optional[bytes]:
+        """Memory tier only"""
+        with self._lock:
+            audio = self.memory.get(key)
+            if audio is not None:
+                self.memory.move_to_end(key)
+                TTS_CACHE_REQUESTS.inc(tier="memory")
+            return audio
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Both tiers; blocking, run it off the event loop"""
+        audio = self.get_memory(key)
+        if audio is not None:
+            return audio
+
+        with self._lock:
+            if key not in self.disk:
+                TTS_CACHE_REQUESTS.inc(tier="miss")
+                return None
+            self.disk.move_to_end(key)
+
+        try:
+            with open(self._path(key), "rb") as audio_file:
+                audio = audio_file.read()
+        except OSError:
+            # Evicted or removed underneath us
+            with self._lock:
+                self.disk_size -= self.disk.pop(key, 0)
+            TTS_CACHE_REQUESTS.inc(tier="miss")
+            return None
+
+        TTS_CACHE_REQUESTS.inc(tier="disk")
+        with self._lock:
+            self._remember(key, audio)
+        return audio
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self.memory or key in self.disk
+
+    def put(self, key: str, audio: bytes) -> None:
+        """Store audio in both tiers; blocking, run it off the event loop"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique across threads and worker processes sharing the directory
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as audio_file:
+            audio_file.write(audio)
+        os.replace(temporary, path)
+
+        with self._lock:
+            self._remember(key, audio)
+            self.disk_size += len(audio) - self.disk.pop(key, 0)
+            self.disk[key] = len(audio)
+            evicted = []
+            while self.disk_size > self.disk_bytes and len(self.disk) > 1:
+                old_key, size = self.disk.popitem(last=False)
+                self.disk_size -= size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.memory_bytes:
+            return
+        self.memory_size += len(audio) - len(self.memory.pop(key, b""))
+        self.memory[key] = audio
+        while self.memory_size > self.memory_bytes:
+            _, old_audio = self.memory.popitem(last=False)
+            self.memory_size -= len(old_audio)
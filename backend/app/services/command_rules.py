@@ -0,0 +1,284 @@
+from typing import Dict, Any, List, Optional, Tuple
+from enum import Enum
+import json
+import re
+from .smart_home import DeviceType, DeviceAction
+
+DEFAULT_DEVICE_KEYWORDS = {
+    DeviceType.LIGHT: ["light", "lights", "lamp", "lamps", "bulb", "bulbs"],
+    DeviceType.THERMOSTAT: ["thermostat", "temperature", "ac", "air conditioning", "heat", "heating"],
+    DeviceType.LOCK: ["lock", "door", "front door", "back door"],
+    DeviceType.SWITCH: ["switch", "plug", "outlet"],
+    DeviceType.CAMERA: ["camera", "cam", "security camera", "security"]
+}
+
+# Device keywords that also describe other devices ("security light",
+# "light switch"); any other device noun in the command wins over them
+DEFAULT_DEVICE_MODIFIERS = ["security", "switch"]
+
+DEFAULT_ACTION_KEYWORDS = {
+    DeviceAction.TURN_ON: ["turn on", "switch on", "enable", "activate"],
+    DeviceAction.TURN_OFF: ["turn off", "switch off", "disable", "deactivate"],
+    DeviceAction.SET_TEMPERATURE: ["set", "change to", "adjust"],
+    DeviceAction.LOCK: ["lock", "secure"],
+    DeviceAction.UNLOCK: ["unlock", "open"],
+    DeviceAction.GET_STATUS: ["status", "check"]
+}
+
+DEFAULT_BRIGHTNESS_KEYWORDS = {
+    "dim": 30,
+    "medium": 50,
+    "bright": 100,
+    "full brightness": 100
+}
+
+TEMPERATURE_UNITS = {
+    "degree": None,
+    "degrees": None,
+    "°": None,
+    "c": "celsius",
+    "°c": "celsius",
+    "celsius": "celsius",
+    "f": "fahrenheit",
+    "°f": "fahrenheit",
+    "fahrenheit": "fahrenheit"
+}
+
+PERCENT_UNITS = {"%", "percent"}
+
+# Numbers followed by an optional unit, e.g. "72 degrees", "21.5°c", "40%"
+NUMBER_PATTERN = re.compile(
+    r"(?<![\w.])(\d+(?:\.\d+)?)\s*"
+    r"(°\s*[cf]\b|°|%|per\s*cent\b|percent\b|degrees?\b|celsius\b|fahrenheit\b|[cf]\b)?",
+    re.IGNORECASE
+)
+
+
+class KeywordMatcher:
+    """
+    Single precompiled regex over every keyword of a rule table.
+
+    Keywords match on word boundaries only, so "unlock" never hits the
+    "lock" rule. When several keywords occur in a command the longest one
+    wins, ties going to the earliest occurrence.
+    """
+
+    def __init__(self, keywords: Dict[Enum, List[str]]):
+        self.lookup: Dict[str, Enum] = {}
+        for value, words in keywords.items():
+            for word in words:
+                self.lookup.setdefault(self._normalize(word), value)
+        self.pattern = self._compile(self.lookup)
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    @staticmethod
+    def _compile(words) -> "re.Pattern":
+        # Longest alternatives first so the regex prefers them at any position
+        alternatives = sorted(words, key=len, reverse=True)
+        pattern = "|".join(
+            re.escape(word).replace(r"\ ", r"\s+") for word in alternatives
+        )
+        return re.compile(rf"(?<!\w)(?:{pattern})(?!\w)", re.IGNORECASE)
+
+    def match(self, command: str) -> Optional[Enum]:
+        """Return the value of the longest keyword in the command"""
+        best = None
+        for match in self.pattern.finditer(command):
+            word = self._normalize(match.group(0))
+            if best is None or len(word) > len(best):
+                best = word
+        if best is None:
+            return None
+        return self.lookup[best]
+
+
+class DeviceCommandMatcher:
+    """
+    One precompiled regex over the device and action keyword tables.
+
+    A single pass finds both. At any position the longest keyword of
+    either table wins, so the action phrase "switch on" hides the device
+    word "switch" inside it, while a word listed in both tables, like
+    "lock", counts for both. Per table the longest occurrence wins, ties
+    going to the earliest; weak device keywords only win when no other
+    device keyword occurs.
+    """
+
+    def __init__(
+        self,
+        device_keywords: Dict[DeviceType, List[str]],
+        action_keywords: Dict[DeviceAction, List[str]],
+        weak: List[str] = ()
+    ):
+        weak = {KeywordMatcher._normalize(word) for word in weak}
+        devices = KeywordMatcher(device_keywords).lookup
+        actions = KeywordMatcher(action_keywords).lookup
+
+        # word -> (device rank or None, device, action rank or None, action)
+        self.lookup: Dict[str, Tuple] = {}
+        for word in set(devices) | set(actions):
+            self.lookup[word] = (
+                (word not in weak, len(word)) if word in devices else None,
+                devices.get(word),
+                len(word) if word in actions else None,
+                actions.get(word)
+            )
+        self.pattern = KeywordMatcher._compile(self.lookup)
+
+    def match(self, command: str) -> Tuple[Optional[DeviceType], Optional[DeviceAction]]:
+        device = action = None
+        device_rank = action_rank = None
+        for match in self.pattern.finditer(command):
+            word = match.group(0).lower()
+            entry = self.lookup.get(word) or self.lookup[KeywordMatcher._normalize(word)]
+            # Strictly greater, so ties keep the earliest occurrence
+            if entry[0] is not None and (device_rank is None or entry[0] > device_rank):
+                device_rank, device = entry[0], entry[1]
+            if entry[2] is not None and (action_rank is None or entry[2] > action_rank):
+                action_rank, action = entry[2], entry[3]
+        return device, action
+
+
+class CommandRules:
+    """
+    Compiled rule engine for smart home commands.
+
+    Built once per process; rules can be extended or overridden from a JSON
+    file with optional "devices", "actions", "brightness" and "modifiers"
+    sections, e.g.
+    {"devices": {"light": ["chandelier"]}, "brightness": {"night": 10}}.
+    """
+
+    def __init__(
+        self,
+        device_keywords: Dict[DeviceType, List[str]] = None,
+        action_keywords: Dict[DeviceAction, List[str]] = None,
+        brightness_keywords: Dict[str, int] = None,
+        device_modifiers: List[str] = None
+    ):
+        self.device_keywords = device_keywords or DEFAULT_DEVICE_KEYWORDS
+        self.device_modifiers = (
+            DEFAULT_DEVICE_MODIFIERS if device_modifiers is None else device_modifiers
+        )
+        self.action_keywords = action_keywords or DEFAULT_ACTION_KEYWORDS
+        self.brightness_keywords = {
+            KeywordMatcher._normalize(word): value
+            for word, value in (brightness_keywords or DEFAULT_BRIGHTNESS_KEYWORDS).items()
+        }
+
+        self.command_matcher = DeviceCommandMatcher(
+            self.device_keywords,
+            self.action_keywords,
+            self.device_modifiers
+        )
+        self.brightness_matcher = KeywordMatcher(
+            {word: [word] for word in self.brightness_keywords}
+        )
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "CommandRules":
+        """
+        Build rules from the defaults, merged with the JSON file at path
+        """
+        if not path:
+            return cls()
+
+        with open(path) as rules_file:
+            overrides = json.load(rules_file)
+
+        return cls(
+            device_keywords=cls._merge(
+                DEFAULT_DEVICE_KEYWORDS, DeviceType, overrides.get("devices", {})
+            ),
+            action_keywords=cls._merge(
+                DEFAULT_ACTION_KEYWORDS, DeviceAction, overrides.get("actions", {})
+            ),
+            brightness_keywords={
+                **DEFAULT_BRIGHTNESS_KEYWORDS,
+                **overrides.get("brightness", {})
+            },
+            device_modifiers=overrides.get("modifiers", DEFAULT_DEVICE_MODIFIERS)
+        )
+
+    @staticmethod
+    def _merge(
+        defaults: Dict[Enum, List[str]],
+        enum_type: type,
+        overrides: Dict[str, List[str]]
+    ) -> Dict[Enum, List[str]]:
+        merged = {key: list(words) for key, words in defaults.items()}
+        for name, words in overrides.items():
+            key = enum_type(name)
+            merged[key] = merged.get(key, []) + [
+                word for word in words if word not in merged.get(key, [])
+            ]
+        return merged
+
+    def parse(self, command: str) -> Tuple[Optional[DeviceType], Optional[DeviceAction]]:
+        """
+        Identify device type and action from command in one pass. Words
+        inside an action phrase, like "switch" in "switch on the light",
+        don't name the device.
+        """
+        return self.command_matcher.match(command)
+
+    def identify_device_type(self, command: str) -> Optional[DeviceType]:
+        """Identify device type from command"""
+        return self.parse(command)[0]
+
+    def identify_device_action(self, command: str) -> Optional[DeviceAction]:
+        """Identify device action from command"""
+        return self.parse(command)[1]
+
+    def extract_numbers(self, command: str) -> List[Tuple[float, Optional[str]]]:
+        """Return every (value, unit) pair in the command"""
+        results = []
+        for match in NUMBER_PATTERN.finditer(command):
+            unit = match.group(2)
+            if unit:
+                unit = "".join(unit.lower().split())
+            results.append((float(match.group(1)), unit))
+        return results
+
+    def extract_parameters(
+        self,
+        command: str,
+        device_type: DeviceType,
+        context: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Extract additional parameters from command"""
+        params = {}
+        numbers = self.extract_numbers(command)
+
+        if device_type == DeviceType.THERMOSTAT:
+            # Prefer a value with a temperature unit, otherwise the first bare number
+            temperature = next(
+                (n for n in numbers if n[1] in TEMPERATURE_UNITS),
+                next((n for n in numbers if n[1] is None), None)
+            )
+            if temperature:
+                params["temperature"] = temperature[0]
+                unit = TEMPERATURE_UNITS.get(temperature[1])
+                if unit:
+                    params["unit"] = unit
+            elif "preferences" in context:
+                # Use preferred temperature from user context
+                params["temperature"] = (context["preferences"] or {}).get(
+                    "preferred_temperature",
+                    22
+                )
+
+        elif device_type == DeviceType.LIGHT:
+            # Extract brightness, an explicit percentage wins over keywords
+            percent = next((n for n in numbers if n[1] in PERCENT_UNITS), None)
+            if percent:
+                params["brightness"] = int(min(max(percent[0], 0), 100))
+            else:
+                keyword = self.brightness_matcher.match(command)
+                if keyword:
+                    params["brightness"] = self.brightness_keywords[keyword]
+
+        return params
@@ -0,0 +1,165 @@
+from typing import Dict, Any, Callable, Awaitable, List, Optional, Tuple
+from functools import cached_property
+import asyncio
+import time
+from .ai_engine import AIEngine
+from .voice_processor import VoiceProcessor
+from .smart_home import SmartHomeController
+from .task_executor import TaskExecutor
+from .task_queue import TaskQueue
+from .user_context import UserContextManager
+from .interaction_log import InteractionLog
+from .shortcuts import ShortcutRegistry
+from .single_flight import SingleFlight
+from ..core.config import settings
+from ..core.database import ping_database
+
+
+class ServiceContainer:
+    """
+    One shared instance of each service per worker process.
+
+    Services are built lazily on first use. startup() and shutdown() are
+    driven by the FastAPI lifespan and only touch services that exist.
+    """
+
+    def __init__(self):
+        self.task_result_handlers: List[Callable[[int, Dict[str, Any]], Awaitable[None]]] = []
+        self.prewarm_task: Optional[asyncio.Task] = None
+        self.upstream_probe = SingleFlight("health_probe")
+        self.ai_engine_health: Optional[Tuple[float, Dict[str, Any]]] = None
+
+    @cached_property
+    def ai_engine(self) -> AIEngine:
+        return AIEngine()
+
+    @cached_property
+    def voice_processor(self) -> VoiceProcessor:
+        return VoiceProcessor()
+
+    @cached_property
+    def smart_home(self) -> SmartHomeController:
+        return SmartHomeController()
+
+    @cached_property
+    def task_executor(self) -> TaskExecutor:
+        return TaskExecutor(smart_home=self.smart_home)
+
+    @cached_property
+    def task_queue(self) -> TaskQueue:
+        return TaskQueue(self.task_executor, deliver=self._deliver_task_result)
+
+    @cached_property
+    def shortcuts(self) -> ShortcutRegistry:
+        return ShortcutRegistry()
+
+    @cached_property
+    def interaction_log(self) -> InteractionLog:
+        return InteractionLog()
+
+    @cached_property
+    def context_manager(self) -> UserContextManager:
+        return UserContextManager(interaction_log=self.interaction_log)
+
+    def on_task_result(
+        self,
+        handler: Callable[[int, Dict[str, Any]], Awaitable[None]]
+    ) -> None:
+        """Register a callback for results of tasks submitted to the queue"""
+        self.task_result_handlers.append(handler)
+
+    async def _deliver_task_result(self, user_id: int, result: Dict[str, Any]) -> None:
+        for handler in self.task_result_handlers:
+            await handler(user_id, result)
+
+    def _built(self, name: str) -> bool:
+        return name in self.__dict__
+
+    async def startup(self) -> None:
+        """
+        Start background services without waiting on any network round trip
+        """
+        await self.smart_home.connect()
+        await self.task_queue.start()
+        await self.interaction_log.start()
+
+        if settings.TTS_CACHE_PREWARM:
+            # Synthesize the fixed response phrases in the background
+            self.prewarm_task = asyncio.create_task(
+                self.voice_processor.prewarm(self.task_executor.known_responses())
+            )
+
+    async def health(self) -> Dict[str, Any]:
+        """
+        Probe the database pool, the MQTT connection and the model upstream.
+
+        Only the database decides "unhealthy". An upstream being down makes
+        the worker "degraded", since it still answers from local fallbacks
+        and taking it out of rotation wouldn't help. The model upstream
+        result is reused for HEALTH_UPSTREAM_CACHE_TTL seconds so frequent
+        probes don't each call the OpenAI API.
+        """
+        database, ai_engine = await asyncio.gather(
+            self._probe(asyncio.to_thread(ping_database)),
+            self._probe_ai_engine()
+        )
+        mqtt = {"status": "up" if self.smart_home.is_connected() else "down"}
+
+        checks = {"database": database, "mqtt": mqtt, "ai_engine": ai_engine}
+        if database["status"] != "up":
+            status = "unhealthy"
+        elif any(check["status"] != "up" for check in checks.values()):
+            status = "degraded"
+        else:
+            status = "healthy"
+        return {"status": status, "services": checks}
+
+    async def _probe_ai_engine(self) -> Dict[str, Any]:
+        cached = self.ai_engine_health
+        if cached and time.monotonic() - cached[0] < settings.HEALTH_UPSTREAM_CACHE_TTL:
+            return cached[1]
+
+        async def probe() -> Dict[str, Any]:
+            result = await self._probe(self.ai_engine.ping())
+            self.ai_engine_health = (time.monotonic(), result)
+            return result
+
+        # Concurrent health checks on a stale entry share one probe
+        return await self.upstream_probe.do("ai_engine", probe)
+
+    async def _probe(self, probe: Awaitable) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe, settings.HEALTH_CHECK_TIMEOUT)
+        except Exception as e:
+            return {"status": "down", "error": str(e) or type(e).__name__}
+        return {
+            "status": "up",
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    async def shutdown(self) -> None:
+        """
+        Stop background services and close upstream connections
+        """
+        if self.prewarm_task:
+            self.prewarm_task.cancel()
+            await asyncio.gather(self.prewarm_task, return_exceptions=True)
+            self.prewarm_task = None
+        if self._built("task_queue"):
+            await self.task_queue.stop()
+        if self._built("interaction_log"):
+            await self.interaction_log.stop()
+        if self._built("smart_home"):
+            await self.smart_home.disconnect()
+        if self._built("ai_engine"):
+            await self.ai_engine.close()
+        if self._built("voice_processor"):
+            await self.voice_processor.close()
+
+
+services = ServiceContainer()
+
+
+def get_services() -> ServiceContainer:
+    return services
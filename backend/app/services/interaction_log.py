@@ -0,0 +1,162 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import json
+from sqlalchemy import insert, delete, select
+from ..models.interaction import Interaction
+from ..core.config import settings
+from ..core.database import SessionLocal, engine
+from ..core.metrics import registry
+
+INTERACTIONS_DROPPED = registry.counter(
+    "qia_interactions_dropped_total",
+    "Interactions dropped because the write buffer was full"
+)
+
+
+class InteractionLog:
+    """
+    Append-only log of every command a user sends.
+
+    record() only buffers the row; a background task inserts the buffer
+    in one batch every flush_interval seconds, or sooner once batch_size
+    rows are waiting. The same task deletes rows older than the retention
+    window, a bounded batch at a time.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.INTERACTION_LOG_BATCH_SIZE,
+        flush_interval: float = settings.INTERACTION_LOG_FLUSH_INTERVAL,
+        max_pending: int = settings.INTERACTION_LOG_MAX_PENDING,
+        retention: timedelta = timedelta(days=settings.INTERACTION_RETENTION_DAYS)
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retention = retention
+        self.pending: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        try:
+            # The table is new to existing databases, create it if missing
+            await asyncio.to_thread(Interaction.__table__.create, engine, checkfirst=True)
+        except Exception as e:
+            print(f"Error creating interactions table: {str(e)}")
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the writer and flush whatever is still buffered"""
+        if not self._task:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+
+    def record(self, user_id: int, command: str, result: Dict[str, Any]) -> None:
+        if len(self.pending) >= self.max_pending:
+            # The database is behind; keep the newest rows
+            self.pending.pop(0)
+            INTERACTIONS_DROPPED.inc()
+
+        self.pending.append({
+            "user_id": user_id,
+            "created_at": datetime.utcnow(),
+            "command": command,
+            "task_type": result.get("task_type"),
+            "status": result.get("status"),
+            # Round trip so the JSON column never sees datetimes and the like
+            "result": json.loads(json.dumps(result, default=str))
+        })
+        if len(self.pending) >= self.batch_size and self._wakeup:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        try:
+            await asyncio.to_thread(self._insert, rows)
+        except Exception as e:
+            print(f"Error writing interactions: {str(e)}")
+            # Put them back in front of anything recorded meanwhile
+            self.pending = (rows + self.pending)[-self.max_pending:]
+
+    async def recent(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Last `limit` interactions of a user, oldest first"""
+        return await asyncio.to_thread(self._recent, user_id, limit)
+
+    async def purge(self) -> int:
+        """Delete interactions older than the retention window"""
+        cutoff = datetime.utcnow() - self.retention
+        deleted = 0
+        while True:
+            count = await asyncio.to_thread(self._delete_before, cutoff)
+            deleted += count
+            if count < settings.INTERACTION_RETENTION_BATCH:
+                return deleted
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+            if loop.time() - self._last_purge >= settings.INTERACTION_RETENTION_INTERVAL:
+                self._last_purge = loop.time()
+                try:
+                    await self.purge()
+                except Exception as e:
+                    print(f"Error purging interactions: {str(e)}")
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(insert(Interaction), rows)
+            db.commit()
+        finally:
+            db.close()
+
+    def _recent(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Interaction.command, Interaction.result, Interaction.created_at)
+                .where(Interaction.user_id == user_id)
+                .order_by(Interaction.created_at.desc())
+                .limit(limit)
+            ).all()
+        finally:
+            db.close()
+        return [
+            {"command": command, "result": result, "timestamp": created_at}
+            for command, result, created_at in reversed(rows)
+        ]
+
+    def _delete_before(self, cutoff: datetime) -> int:
+        db = SessionLocal()
+        try:
+            expired = (
+                select(Interaction.id)
+                .where(Interaction.created_at < cutoff)
+                .limit(settings.INTERACTION_RETENTION_BATCH)
+            )
+            result = db.execute(
+                delete(Interaction).where(Interaction.id.in_(expired.scalar_subquery())),
+                execution_options={"synchronize_session": False}
+            )
+            db.commit()
+            return result.rowcount
+        finally:
+            db.close()
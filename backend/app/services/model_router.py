@@ -0,0 +1,88 @@
+from typing import Dict, Optional
+from collections import deque
+import time
+from ..core.metrics import registry
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+LLM_REQUESTS = registry.counter(
+    "qia_llm_requests_total",
+    "Chat completion attempts by model, attempt kind and outcome",
+    ["model", "attempt", "outcome"]
+)
+LLM_CIRCUIT_OPEN = registry.gauge(
+    "qia_llm_circuit_open",
+    "1 while the model upstream circuit breaker is open"
+)
+
+
+class LatencyTracker:
+    """
+    Recent latencies of one model, used to pick the hedging delay
+    """
+
+    def __init__(self, window: int = 256, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._sorted = None
+
+    def observe(self, latency: float) -> None:
+        self.samples.append(latency)
+        self._sorted = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """None until enough samples have been seen"""
+        if len(self.samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        index = min(len(self._sorted) - 1, int(q * len(self._sorted)))
+        return self._sorted[index]
+
+
+class CircuitBreaker:
+    """
+    Consecutive failure breaker.
+
+    Opens after `failure_threshold` failures in a row. Once `reset_timeout`
+    has passed a single trial call is let through; its outcome closes the
+    breaker or opens it for another period.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        LLM_CIRCUIT_OPEN.set(0)
+
+    def allow(self) -> bool:
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_timeout:
+            # Open, or half open with the trial call still running
+            return False
+        # Let a trial through; a trial that never reported back is replaced
+        self.state = CIRCUIT_HALF_OPEN
+        self.opened_at = now
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state != CIRCUIT_CLOSED:
+            self.state = CIRCUIT_CLOSED
+            LLM_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+            LLM_CIRCUIT_OPEN.set(1)
+
+    def status(self) -> Dict[str, object]:
+        return {"state": self.state, "failures": self.failures}
@@ -0,0 +1,100 @@
+from typing import Dict, Any, TYPE_CHECKING
+from .task_executor import TaskType, TASK_FAILED_MESSAGE
+from .task_queue import QUEUED_TASK_TYPES
+from .shortcuts import execute_shortcut
+from ..core.metrics import stage
+
+if TYPE_CHECKING:
+    from .container import ServiceContainer
+
+
+class CommandFailed(Exception):
+    """The model could not make sense of the command"""
+
+    def __init__(self, error: str, error_type: str):
+        super().__init__(error)
+        self.error = error
+        self.error_type = error_type
+
+
+async def dispatch_command(
+    services: "ServiceContainer",
+    pipeline: str,
+    text: str,
+    user_id: int,
+    user_context: Dict[str, Any],
+    defer_long_tasks: bool = False
+) -> Dict[str, Any]:
+    """
+    Answer one command the way every pipeline does: a matching shortcut
+    runs directly, anything else goes through the model and the task it
+    identifies. With defer_long_tasks, QUEUED_TASK_TYPES are submitted and
+    answered later through the queue's deliver callback.
+
+    Raises CommandFailed when the model call fails.
+    """
+    shortcut = services.shortcuts.match(
+        user_id,
+        user_context.get("custom_shortcuts"),
+        text
+    )
+    if shortcut:
+        # User defined shortcuts skip the model entirely
+        with stage(pipeline, "shortcut"):
+            return await execute_shortcut(
+                services.task_queue,
+                shortcut,
+                user_id,
+                user_context
+            )
+
+    # Process command through AI engine
+    with stage(pipeline, "llm"):
+        ai_response = await services.ai_engine.process_command(
+            text,
+            context=user_context
+        )
+    if ai_response["status"] != "success":
+        raise CommandFailed(
+            ai_response.get("error", "Failed to process command"),
+            ai_response.get("error_type", "internal")
+        )
+
+    task_type = TaskType(ai_response["task_identified"])
+    task_params = {
+        "command": text,
+        "user_id": user_id,
+        "context": user_context
+    }
+
+    if ai_response.get("degraded") and task_type == TaskType.GENERAL:
+        # The model is unavailable; answer with the fallback message
+        task_result = services.ai_engine.degraded_result(ai_response)
+    elif defer_long_tasks and task_type in QUEUED_TASK_TYPES:
+        with stage(pipeline, "task_submit"):
+            task_id = await services.task_queue.submit(task_type, task_params, user_id)
+        task_result = {
+            "status": "queued",
+            "task_type": task_type.value,
+            "task_id": task_id
+        }
+    else:
+        # Execute task and get response
+        with stage(pipeline, "task"):
+            task_result = await services.task_queue.run(task_type, task_params, user_id)
+
+    if ai_response.get("degraded"):
+        task_result = {
+            **task_result,
+            "degraded": True,
+            "error_type": ai_response["error_type"]
+        }
+    return task_result
+
+
+def reply_message(task_result: Dict[str, Any]) -> str:
+    """
+    The text to speak for a task result; errors and expired tasks have
+    no result message
+    """
+    return (task_result.get("result") or {}).get("message") or TASK_FAILED_MESSAGE
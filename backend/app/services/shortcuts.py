@@ -0,0 +1,219 @@
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import json
+import re
+from .task_executor import TaskType, TASK_FAILED_MESSAGE
+from .task_queue import TaskQueue
+from ..core.config import settings
+
+SLOT_PATTERN = re.compile(r"\{(\w+)\}")
+# task_type of a macro result; the steps keep their own task types
+SHORTCUT_TASK_TYPE = "shortcut"
+TOKEN_PUNCTUATION = ".,!?;:"
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = (token.strip(TOKEN_PUNCTUATION) for token in text.lower().split())
+    return [token for token in tokens if token]
+
+
+class ShortcutStep:
+    def __init__(self, task_type: TaskType, command: str):
+        self.task_type = task_type
+        self.command = command
+
+    def render(self, params: Dict[str, str]) -> str:
+        """Fill {slot} placeholders in the command with the matched values"""
+        return SLOT_PATTERN.sub(
+            lambda slot: params.get(slot.group(1), slot.group(0)),
+            self.command
+        )
+
+
+class ShortcutMatch:
+    def __init__(self, name: str, steps: List[ShortcutStep], params: Dict[str, str]):
+        self.name = name
+        self.steps = steps
+        self.params = params
+
+    def commands(self) -> List[Tuple[TaskType, str]]:
+        return [(step.task_type, step.render(self.params)) for step in self.steps]
+
+
+class _Node:
+    __slots__ = ("children", "slots", "shortcut")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.slots: Dict[str, "_Node"] = {}
+        self.shortcut: Optional[Tuple[str, List[ShortcutStep]]] = None
+
+
+class ShortcutIndex:
+    """
+    Token trie over one user's shortcuts.
+
+    Patterns are phrases such as "movie night" or "set {room} to {value}";
+    a {slot} matches one or more words. A shortcut maps to one step or a
+    list of steps run in order. A step is either a dict with "command" and
+    an optional "task_type" (default smart_home), or a plain command string.
+
+        {
+            "movie night": [
+                "turn off the living room lights",
+                "turn on the tv plug"
+            ],
+            "warm up the {room}": {"command": "set the {room} thermostat to 22 degrees"}
+        }
+    """
+
+    def __init__(self, shortcuts: Dict[str, Any]):
+        self.root = _Node()
+        for pattern, definition in shortcuts.items():
+            try:
+                self.add(pattern, self._parse_steps(definition))
+            except (TypeError, ValueError, KeyError) as e:
+                print(f"Skipping shortcut {pattern!r}: {str(e)}")
+
+    @staticmethod
+    def _parse_steps(definition: Any) -> List[ShortcutStep]:
+        definitions = definition if isinstance(definition, list) else [definition]
+        steps = []
+        for step in definitions:
+            if isinstance(step, str):
+                step = {"command": step}
+            steps.append(ShortcutStep(
+                TaskType(step.get("task_type", TaskType.SMART_HOME.value)),
+                step["command"]
+            ))
+        if not steps:
+            raise ValueError("no steps")
+        return steps
+
+    def add(self, pattern: str, steps: List[ShortcutStep]) -> None:
+        tokens = tokenize(pattern)
+        if not tokens:
+            raise ValueError("empty pattern")
+
+        node = self.root
+        for token in tokens:
+            slot = SLOT_PATTERN.fullmatch(token)
+            if slot:
+                node = node.slots.setdefault(slot.group(1), _Node())
+            else:
+                node = node.children.setdefault(token, _Node())
+        node.shortcut = (pattern, steps)
+
+    def match(self, command: str) -> Optional[ShortcutMatch]:
+        """The shortcut matching the whole command, literal words before slots"""
+        tokens = tokenize(command)
+        if not tokens:
+            return None
+        found = self._match(self.root, tokens, 0, {})
+        if not found:
+            return None
+        (name, steps), params = found
+        return ShortcutMatch(name, steps, params)
+
+    def _match(self, node: _Node, tokens: List[str], position: int, params: Dict[str, str]):
+        if position == len(tokens):
+            return (node.shortcut, params) if node.shortcut else None
+
+        child = node.children.get(tokens[position])
+        if child:
+            found = self._match(child, tokens, position + 1, params)
+            if found:
+                return found
+
+        for name, child in node.slots.items():
+            # Shortest value first, so later literal words still get a chance
+            for end in range(position + 1, len(tokens) + 1):
+                found = self._match(
+                    child,
+                    tokens,
+                    end,
+                    {**params, name: " ".join(tokens[position:end])}
+                )
+                if found:
+                    return found
+        return None
+
+
+class ShortcutRegistry:
+    """
+    Compiled shortcut indexes per user.
+
+    An index is rebuilt only when the user's shortcuts change, detected by
+    a fingerprint of their definition. The least recently used users are
+    dropped beyond max_users.
+    """
+
+    def __init__(self, max_users: int = settings.SHORTCUT_CACHE_SIZE):
+        self.max_users = max_users
+        self.indexes: "OrderedDict[int, Tuple[str, ShortcutIndex]]" = OrderedDict()
+
+    @staticmethod
+    def fingerprint(shortcuts: Dict[str, Any]) -> str:
+        return hashlib.sha256(
+            json.dumps(shortcuts, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def index_for(self, user_id: int, shortcuts: Dict[str, Any]) -> ShortcutIndex:
+        fingerprint = self.fingerprint(shortcuts)
+        cached = self.indexes.get(user_id)
+        if cached and cached[0] == fingerprint:
+            self.indexes.move_to_end(user_id)
+            return cached[1]
+
+        index = ShortcutIndex(shortcuts)
+        self.indexes[user_id] = (fingerprint, index)
+        self.indexes.move_to_end(user_id)
+        while len(self.indexes) > self.max_users:
+            self.indexes.popitem(last=False)
+        return index
+
+    def match(
+        self,
+        user_id: int,
+        shortcuts: Optional[Dict[str, Any]],
+        command: str
+    ) -> Optional[ShortcutMatch]:
+        if not shortcuts:
+            return None
+        return self.index_for(user_id, shortcuts).match(command)
+
+
+async def execute_shortcut(
+    task_queue: TaskQueue,
+    shortcut: ShortcutMatch,
+    user_id: int,
+    context: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """
+    Run the steps of a matched shortcut in order, skipping the model
+    """
+    results = []
+    for task_type, command in shortcut.commands():
+        results.append(await task_queue.run(
+            task_type,
+            {"command": command, "user_id": user_id, "context": context},
+            user_id
+        ))
+
+    if len(results) == 1:
+        return {**results[0], "shortcut": shortcut.name}
+
+    messages = [
+        result["result"]["message"]
+        for result in results
+        if result["status"] == "success" and result["result"].get("message")
+    ]
+    return {
+        "status": "success" if all(r["status"] == "success" for r in results) else "error",
+        "task_type": SHORTCUT_TASK_TYPE,
+        "shortcut": shortcut.name,
+        "result": {"message": ". ".join(messages) or TASK_FAILED_MESSAGE, "steps": results},
+        "timestamp": datetime.utcnow().isoformat()
+    }
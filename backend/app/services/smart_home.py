@@ -1,10 +1,14 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import paho.mqtt.client as mqtt
 import json
 from ..core.config import settings
+from ..core.metrics import UPSTREAM_ERRORS, stage
+from ..core.rate_limit import admission, RateLimited, PRIORITY_DEVICE
 import asyncio
 from enum import Enum
 
+NO_DEVICE_MESSAGE = "No {device_type} device found"
+
 class DeviceType(Enum):
     LIGHT = "light"
     THERMOSTAT = "thermostat"
@@ -21,23 +25,48 @@ class DeviceAction(Enum):
     GET_STATUS = "get_status"
 
 class SmartHomeController:
-    def __init__(self):
-        self.mqtt_client = mqtt.Client()
+    def __init__(self, mqtt_client: Optional[mqtt.Client] = None):
+        self.mqtt_client = mqtt_client or mqtt.Client()
         self.mqtt_client.on_connect = self._on_connect
         self.mqtt_client.on_message = self._on_message
         self.device_states: Dict[str, Dict] = {}
-        
-        # Connect to MQTT broker
-        self.mqtt_client.username_pw_set(
-            settings.MQTT_USERNAME,
-            settings.MQTT_PASSWORD
-        )
-        self.mqtt_client.connect(
+        # Commands waiting for the next state message of each device
+        self.ack_waiters: Dict[str, List[asyncio.Future]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.started = False
+
+    async def connect(self):
+        """
+        Start the MQTT network thread, the broker connection is made in the
+        background so startup never waits on it
+        """
+        if self.started:
+            return
+
+        if settings.MQTT_USERNAME:
+            self.mqtt_client.username_pw_set(
+                settings.MQTT_USERNAME,
+                settings.MQTT_PASSWORD
+            )
+        self.mqtt_client.connect_async(
             settings.MQTT_BROKER,
             settings.MQTT_PORT,
             60
         )
         self.mqtt_client.loop_start()
+        self.started = True
+
+    async def disconnect(self):
+        """Disconnect from the broker and stop the network thread"""
+        if not self.started:
+            return
+
+        self.mqtt_client.disconnect()
+        self.mqtt_client.loop_stop()
+        self.started = False
+
+    def is_connected(self) -> bool:
+        return self.mqtt_client.is_connected()
 
     def _on_connect(self, client, userdata, flags, rc):
         """Subscribe to device topics on connect"""
@@ -49,6 +78,9 @@ class SmartHomeController:
             payload = json.loads(msg.payload.decode())
             device_id = msg.topic.split('/')[-1]
             self.device_states[device_id] = payload
+            if self.loop and device_id in self.ack_waiters:
+                # Called on the MQTT network thread
+                self.loop.call_soon_threadsafe(self._acknowledge, device_id)
         except Exception as e:
             print(f"Error processing message: {e}")
 
@@ -67,17 +99,31 @@ class SmartHomeController:
             if not device_id:
                 return {
                     "status": "error",
-                    "message": f"No {device_type.value} device found"
+                    "message": NO_DEVICE_MESSAGE.format(device_type=device_type.value)
                 }
 
             command = self._build_command(action, params)
             topic = f"home/{device_type.value}/{device_id}/set"
             
-            # Publish command to MQTT
-            self.mqtt_client.publish(topic, json.dumps(command))
-            
-            # Wait for state update
-            await self._wait_for_state_update(device_id)
+            ack = None
+            try:
+                # The slot covers the broker publish only; a silent device
+                # says nothing about broker load and must not hold it
+                async with admission.upstream("mqtt", PRIORITY_DEVICE):
+                    # Registered before publishing so a fast ack can't be missed
+                    ack = self._expect_state_update(device_id)
+                    info = self.mqtt_client.publish(topic, json.dumps(command))
+                if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                    UPSTREAM_ERRORS.inc(upstream="mqtt", operation="publish")
+                
+                # Wait for state update
+                with stage("smart_home", "device_ack"):
+                    acknowledged = await self._wait_for_state_update(ack)
+                if not acknowledged:
+                    UPSTREAM_ERRORS.inc(upstream="mqtt", operation="device_ack")
+            finally:
+                if ack:
+                    self._discard_ack(device_id, ack)
             
             return {
                 "status": "success",
@@ -86,6 +132,9 @@ class SmartHomeController:
                 "action": action.value
             }
             
+        except RateLimited:
+            # Answered as busy by the API, not as a device failure
+            raise
         except Exception as e:
             return {
                 "status": "error",
@@ -114,10 +163,29 @@ class SmartHomeController:
                 
         return command
 
-    async def _wait_for_state_update(self, device_id: str, timeout: int = 5):
-        """Wait for device state update confirmation"""
-        start_time = asyncio.get_event_loop().time()
-        while (asyncio.get_event_loop().time() - start_time) < timeout:
-            if device_id in self.device_states:
-                return
-            await asyncio.sleep(0.1) 
\ No newline at end of file
+    def _expect_state_update(self, device_id: str) -> asyncio.Future:
+        """Register for the next state message of the device"""
+        self.loop = asyncio.get_running_loop()
+        ack = self.loop.create_future()
+        self.ack_waiters.setdefault(device_id, []).append(ack)
+        return ack
+
+    def _acknowledge(self, device_id: str) -> None:
+        for ack in self.ack_waiters.pop(device_id, []):
+            if not ack.done():
+                ack.set_result(True)
+
+    def _discard_ack(self, device_id: str, ack: asyncio.Future) -> None:
+        waiters = self.ack_waiters.get(device_id)
+        if waiters and ack in waiters:
+            waiters.remove(ack)
+            if not waiters:
+                del self.ack_waiters[device_id]
+
+    async def _wait_for_state_update(self, ack: asyncio.Future, timeout: int = 5) -> bool:
+        """Wait for the state message answering this command"""
+        try:
+            await asyncio.wait_for(ack, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False 
\ No newline at end of file
@@ -1,11 +1,24 @@
 from enum import Enum
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from datetime import datetime
+from concurrent.futures import Executor
 import asyncio
 import json
 import aiohttp
-from bs4 import BeautifulSoup
-from .smart_home import SmartHomeController, DeviceType, DeviceAction
+from .smart_home import SmartHomeController, DeviceType, DeviceAction, NO_DEVICE_MESSAGE
+from .command_rules import CommandRules
+from ..core.config import settings
+from ..core.rate_limit import RateLimited
+
+# Fixed response messages, also used to pre-warm the TTS cache
+DEVICE_SUCCESS_MESSAGE = "Successfully {action} {device_type}"
+DEVICE_FAILURE_MESSAGE = "Failed to control device: {error}"
+UNKNOWN_DEVICE_MESSAGE = "Could not identify device or action"
+SEARCH_MESSAGE = "Here's what I found"
+CODE_ASSIST_MESSAGE = "Code assist task handled"
+GENERAL_MESSAGE = "General task handled"
+# Spoken when a task result carries no message, e.g. it errored or expired
+TASK_FAILED_MESSAGE = "Sorry, I couldn't complete that"
 
 class TaskType(Enum):
     SCHEDULE = "schedule"
@@ -14,8 +27,20 @@ class TaskType(Enum):
     CODE_ASSIST = "code_assist"
     GENERAL = "general"
 
+def run_code_assist(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    CPU bound code assistance, module level so it can run in a process pool.
+    No assistant is wired up yet, so the request is only acknowledged.
+    """
+    return {"message": CODE_ASSIST_MESSAGE}
+
+# Handlers that may be offloaded to a process pool instead of the event loop
+CPU_TASK_HANDLERS = {
+    TaskType.CODE_ASSIST: run_code_assist
+}
+
 class TaskExecutor:
-    def __init__(self):
+    def __init__(self, smart_home: Optional[SmartHomeController] = None):
         self.task_handlers = {
             TaskType.SCHEDULE: self._handle_schedule,
             TaskType.WEB_SEARCH: self._handle_web_search,
@@ -23,11 +48,18 @@ class TaskExecutor:
             TaskType.CODE_ASSIST: self._handle_code_assist,
             TaskType.GENERAL: self._handle_general
         }
-        self.smart_home = SmartHomeController()
+        self.smart_home = smart_home or SmartHomeController()
+        self.command_rules = CommandRules.load(settings.COMMAND_RULES_FILE)
         
-    async def execute_task(self, task_type: TaskType, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def execute_task(
+        self,
+        task_type: TaskType,
+        params: Dict[str, Any],
+        process_pool: Optional[Executor] = None
+    ) -> Dict[str, Any]:
         """
-        Execute a task based on its type and parameters
+        Execute a task based on its type and parameters, CPU bound handlers
+        run in process_pool when one is given
         """
         handler = self.task_handlers.get(task_type)
         if not handler:
@@ -37,13 +69,24 @@ class TaskExecutor:
             }
             
         try:
-            result = await handler(params)
+            if process_pool and task_type in CPU_TASK_HANDLERS:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    process_pool,
+                    CPU_TASK_HANDLERS[task_type],
+                    params
+                )
+            else:
+                result = await handler(params)
             return {
                 "status": "success",
                 "task_type": task_type.value,
                 "result": result,
                 "timestamp": datetime.utcnow().isoformat()
             }
+        except RateLimited:
+            # Over an upstream limit, the caller answers with a busy reply
+            raise
         except Exception as e:
             return {
                 "status": "error",
@@ -91,7 +134,7 @@ class TaskExecutor:
                     result = await response.json()
                     
             return {
-                "message": "Here's what I found",
+                "message": SEARCH_MESSAGE,
                 "results": result,
                 "type": "web_search"
             }
@@ -104,14 +147,13 @@ class TaskExecutor:
         """
         try:
             command = params["command"].lower()
-            context = params.get("context", {})
+            context = params.get("context") or {}
             
             # Extract device and action
-            device_type = self._identify_device_type(command)
-            action = self._identify_device_action(command)
+            device_type, action = self.command_rules.parse(command)
             
             if not device_type or not action:
-                return {"message": "Could not identify device or action"}
+                return {"message": UNKNOWN_DEVICE_MESSAGE}
             
             # Extract additional parameters
             command_params = self._extract_command_parameters(
@@ -128,45 +170,17 @@ class TaskExecutor:
             )
             
             return {
-                "message": self._format_response(result),
+                "message": self._format_response(result, device_type),
                 "device_type": device_type.value,
                 "action": action.value,
                 "result": result,
                 "type": "smart_home"
             }
+        except RateLimited:
+            raise
         except Exception as e:
             return {"message": f"Smart home control failed: {str(e)}"}
 
-    def _identify_device_type(self, command: str) -> Optional[DeviceType]:
-        """Identify device type from command"""
-        device_keywords = {
-            DeviceType.LIGHT: ["light", "lamp", "bulb"],
-            DeviceType.THERMOSTAT: ["thermostat", "temperature", "ac", "heat"],
-            DeviceType.LOCK: ["lock", "door"],
-            DeviceType.SWITCH: ["switch", "plug", "outlet"],
-            DeviceType.CAMERA: ["camera", "cam", "security"]
-        }
-        
-        for device_type, keywords in device_keywords.items():
-            if any(keyword in command for keyword in keywords):
-                return device_type
-        return None
-
-    def _identify_device_action(self, command: str) -> Optional[DeviceAction]:
-        """Identify device action from command"""
-        action_keywords = {
-            DeviceAction.TURN_ON: ["turn on", "enable", "activate"],
-            DeviceAction.TURN_OFF: ["turn off", "disable", "deactivate"],
-            DeviceAction.SET_TEMPERATURE: ["set", "change to", "adjust"],
-            DeviceAction.LOCK: ["lock", "secure"],
-            DeviceAction.UNLOCK: ["unlock", "open"]
-        }
-        
-        for action, keywords in action_keywords.items():
-            if any(keyword in command for keyword in keywords):
-                return action
-        return None
-
     def _extract_command_parameters(
         self,
         command: str,
@@ -174,48 +188,38 @@ class TaskExecutor:
         context: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Extract additional parameters from command"""
-        params = {}
-        
-        if device_type == DeviceType.THERMOSTAT:
-            # Extract temperature value
-            import re
-            temp_match = re.search(r'(\d+)\s*(?:degrees?|°)?', command)
-            if temp_match:
-                params["temperature"] = float(temp_match.group(1))
-            elif "preferences" in context:
-                # Use preferred temperature from user context
-                params["temperature"] = context["preferences"].get(
-                    "preferred_temperature",
-                    22
-                )
-                
-        elif device_type == DeviceType.LIGHT:
-            # Extract brightness
-            brightness_keywords = {
-                "dim": 30,
-                "bright": 100,
-                "medium": 50
-            }
-            for keyword, value in brightness_keywords.items():
-                if keyword in command:
-                    params["brightness"] = value
-                    break
-                    
-        return params
+        return self.command_rules.extract_parameters(command, device_type, context)
+
+    def known_responses(self) -> List[str]:
+        """Every fixed response message this executor can produce"""
+        return [
+            DEVICE_SUCCESS_MESSAGE.format(action=action.value, device_type=device_type.value)
+            for action in DeviceAction
+            for device_type in DeviceType
+        ] + [
+            DEVICE_FAILURE_MESSAGE.format(
+                error=NO_DEVICE_MESSAGE.format(device_type=device_type.value)
+            )
+            for device_type in DeviceType
+        ] + [
+            UNKNOWN_DEVICE_MESSAGE,
+            SEARCH_MESSAGE,
+            CODE_ASSIST_MESSAGE,
+            GENERAL_MESSAGE,
+            TASK_FAILED_MESSAGE
+        ]
 
-    def _format_response(self, result: Dict[str, Any]) -> str:
+    def _format_response(self, result: Dict[str, Any], device_type: DeviceType) -> str:
         """Format response message for user"""
         if result["status"] == "success":
-            device_type = result.get("device_type", "device")
             action = result.get("action", "updated")
-            return f"Successfully {action} {device_type}"
+            return DEVICE_SUCCESS_MESSAGE.format(action=action, device_type=device_type.value)
         else:
-            return f"Failed to control device: {result.get('message', 'unknown error')}"
+            return DEVICE_FAILURE_MESSAGE.format(error=result.get("message", "unknown error"))
     
     async def _handle_code_assist(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        # TODO: Implement code assistance logic
-        return {"message": "Code assist task handled"}
+        return run_code_assist(params)
     
     async def _handle_general(self, params: Dict[str, Any]) -> Dict[str, Any]:
         # Handle general queries through AI engine
-        return {"message": "General task handled"} 
\ No newline at end of file
+        return {"message": GENERAL_MESSAGE} 
\ No newline at end of file
@@ -0,0 +1,513 @@
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import asyncio
+import itertools
+import json
+import multiprocessing
+import sqlite3
+import threading
+import time
+import uuid
+from .task_executor import TaskExecutor, TaskType
+from ..core.config import settings
+from ..core.metrics import TASKS_IN_FLIGHT
+from ..core.rate_limit import RateLimited
+
+# Lower value runs first
+TASK_PRIORITIES = {
+    TaskType.SMART_HOME: 0,
+    TaskType.SCHEDULE: 1,
+    TaskType.GENERAL: 2,
+    TaskType.WEB_SEARCH: 3,
+    TaskType.CODE_ASSIST: 4
+}
+
+# Maximum handlers of each type running at once
+TASK_CONCURRENCY = {
+    TaskType.SMART_HOME: 16,
+    TaskType.SCHEDULE: 8,
+    TaskType.GENERAL: 8,
+    TaskType.WEB_SEARCH: 4,
+    TaskType.CODE_ASSIST: 2
+}
+
+# Seconds a task may spend queued and running before it is cancelled
+TASK_DEADLINES = {
+    TaskType.SMART_HOME: 10,
+    TaskType.SCHEDULE: 10,
+    TaskType.GENERAL: 30,
+    TaskType.WEB_SEARCH: 20,
+    TaskType.CODE_ASSIST: 60
+}
+
+# Task types answered asynchronously instead of holding the request turn
+QUEUED_TASK_TYPES = {TaskType.WEB_SEARCH, TaskType.CODE_ASSIST}
+
+
+class QueuedTask:
+    def __init__(
+        self,
+        task_type: TaskType,
+        params: Dict[str, Any],
+        user_id: Optional[int],
+        deadline: float,
+        task_id: Optional[str] = None,
+        deliver: bool = True
+    ):
+        self.id = task_id or uuid.uuid4().hex
+        self.task_type = task_type
+        self.params = params
+        self.user_id = user_id
+        self.deadline = deadline
+        self.deliver = deliver
+        self.status = "queued"
+        self.future: Optional[asyncio.Future] = None
+
+
+class TaskStore:
+    """
+    SQLite backed record of queued tasks so pending work survives restarts.
+
+    The file may be shared by several worker processes. Each row names the
+    worker that owns it and carries that worker's last heartbeat; only the
+    owner may update the row. Rows whose owner stopped heartbeating belong
+    to a dead worker and can be claimed by another one.
+    """
+
+    def __init__(self, path: str, owner: str):
+        self.path = path
+        self.owner = owner
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER,
+                task_type TEXT NOT NULL,
+                params TEXT NOT NULL,
+                deadline REAL NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner TEXT,
+                heartbeat REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # Files written before rows had owners; their rows are claimable
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN owner TEXT")
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN heartbeat REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_tasks_status ON tasks (status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_tasks_owner ON tasks (owner)")
+
+    def add(self, task: QueuedTask) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?, ?, ?)",
+                (
+                    task.id,
+                    task.user_id,
+                    task.task_type.value,
+                    json.dumps(task.params, default=str),
+                    task.deadline,
+                    task.status,
+                    now,
+                    now,
+                    self.owner,
+                    now
+                )
+            )
+
+    def set_status(
+        self,
+        task_id: str,
+        status: str,
+        result: Dict[str, Any] = None
+    ) -> bool:
+        """Update the task, False if another worker has claimed it since"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, updated_at = ? "
+                "WHERE id = ? AND owner = ?",
+                (
+                    status,
+                    json.dumps(result, default=str) if result is not None else None,
+                    time.time(),
+                    task_id,
+                    self.owner
+                )
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self) -> None:
+        """Mark this worker's unfinished tasks as still owned"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET heartbeat = ? "
+                "WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time(), self.owner)
+            )
+
+    def release(self) -> None:
+        """Give up this worker's unfinished tasks so the next sweep claims them"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET heartbeat = 0 "
+                "WHERE owner = ? AND status IN ('queued', 'running')",
+                (self.owner,)
+            )
+
+    def claim_abandoned(self, owner_timeout: float) -> List[QueuedTask]:
+        """
+        Take over unfinished tasks whose owner has not heartbeated for
+        owner_timeout seconds, giving each a fresh deadline. Every row is
+        claimed by exactly one worker.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, user_id, task_type, params, owner, heartbeat FROM tasks "
+                "WHERE status IN ('queued', 'running') AND heartbeat < ? "
+                "AND (owner IS NULL OR owner != ?) "
+                "ORDER BY created_at",
+                (now - owner_timeout, self.owner)
+            ).fetchall()
+
+            claimed = []
+            for task_id, user_id, task_type, params, owner, heartbeat in rows:
+                task_type = TaskType(task_type)
+                deadline = now + TASK_DEADLINES[task_type]
+                cursor = self._conn.execute(
+                    "UPDATE tasks SET status = 'queued', deadline = ?, owner = ?, "
+                    "heartbeat = ?, updated_at = ? "
+                    "WHERE id = ? AND owner IS ? AND heartbeat = ? "
+                    "AND status IN ('queued', 'running')",
+                    (deadline, self.owner, now, now, task_id, owner, heartbeat)
+                )
+                if cursor.rowcount == 1:
+                    claimed.append(QueuedTask(
+                        task_type, json.loads(params), user_id, deadline, task_id
+                    ))
+        return claimed
+
+    def purge(self, older_than: float) -> None:
+        """Drop finished tasks last updated before the given timestamp"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM tasks WHERE status NOT IN ('queued', 'running') AND updated_at < ?",
+                (older_than,)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TaskQueue:
+    """
+    Priority queue and worker pool in front of TaskExecutor.
+
+    Tasks are ordered by TASK_PRIORITIES, limited per type by
+    TASK_CONCURRENCY and cancelled once their TASK_DEADLINES budget runs
+    out. Submitted tasks are persisted and their results pushed to the
+    deliver callback; run() awaits the result in place instead. The queue
+    heartbeats the tasks it owns; persisted tasks of a worker that stopped
+    heartbeating are picked up again, with a fresh deadline, by whichever
+    worker sweeps the store first.
+    """
+
+    def __init__(
+        self,
+        executor: TaskExecutor,
+        deliver: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None,
+        store_path: Optional[str] = settings.TASK_QUEUE_DB,
+        workers: int = settings.TASK_QUEUE_WORKERS,
+        process_workers: int = settings.TASK_QUEUE_PROCESS_WORKERS
+    ):
+        self.executor = executor
+        self.deliver = deliver
+        self.owner = uuid.uuid4().hex
+        self.store_path = store_path
+        self.store: Optional[TaskStore] = None
+        self.workers = workers
+        self.process_workers = process_workers
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+
+        self.tasks: Dict[str, QueuedTask] = {}
+        self.running: Dict[str, asyncio.Task] = {}
+        self.active = {task_type: 0 for task_type in TaskType}
+        self.parked = {task_type: deque() for task_type in TaskType}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._recovery: Optional[asyncio.Task] = None
+        self._sequence = itertools.count()
+
+    @property
+    def started(self) -> bool:
+        return self._queue is not None
+
+    async def start(self) -> None:
+        """Start workers and re-queue tasks abandoned by stopped workers"""
+        if self.started:
+            return
+
+        # Set before the first await so concurrent callers don't start twice
+        self._queue = asyncio.PriorityQueue()
+        if self.process_workers:
+            # Forking copies the MQTT, hashing and to_thread threads' locks
+            # mid-use; a fork server starts children from a clean process
+            start_method = (
+                "forkserver"
+                if "forkserver" in multiprocessing.get_all_start_methods()
+                else None
+            )
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context(start_method)
+            )
+
+        if self.store_path:
+            self.store = await asyncio.to_thread(TaskStore, self.store_path, self.owner)
+            await asyncio.to_thread(self.store.purge, time.time() - 86400)
+            self._recovery = asyncio.create_task(self._recover())
+
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Stop workers, leaving unfinished tasks in the store for the next start"""
+        if self._recovery:
+            self._recovery.cancel()
+            await asyncio.gather(self._recovery, return_exceptions=True)
+            self._recovery = None
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+        # Callers waiting in run() get an answer, submitted tasks stay persisted
+        for task in list(self.tasks.values()):
+            if not task.deliver and not task.future.done():
+                task.future.set_result(self._error(task, "Task queue stopped"))
+        self.tasks.clear()
+        if self.store:
+            try:
+                await asyncio.to_thread(self.store.release)
+            except Exception as e:
+                print(f"Error releasing tasks: {str(e)}")
+        self.parked = {task_type: deque() for task_type in TaskType}
+
+        if self.process_pool:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = None
+        if self.store:
+            await asyncio.to_thread(self.store.close)
+            self.store = None
+
+    async def submit(
+        self,
+        task_type: TaskType,
+        params: Dict[str, Any],
+        user_id: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> str:
+        """
+        Queue a task and return its id, the result goes to the deliver callback
+        """
+        task = await self._add(task_type, params, user_id, timeout, deliver=True)
+        return task.id
+
+    async def run(
+        self,
+        task_type: TaskType,
+        params: Dict[str, Any],
+        user_id: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Queue a task and wait for its result
+        """
+        task = await self._add(task_type, params, user_id, timeout, deliver=False)
+        try:
+            return await asyncio.shield(task.future)
+        except asyncio.CancelledError:
+            self.cancel(task.id)
+            raise
+
+    def cancel(self, task_id: str) -> bool:
+        """Cancel a queued or running task"""
+        task = self.tasks.get(task_id)
+        if not task or task.status not in ("queued", "running"):
+            return False
+
+        task.status = "cancelled"
+        if task_id in self.running:
+            self.running[task_id].cancel()
+        return True
+
+    async def _add(
+        self,
+        task_type: TaskType,
+        params: Dict[str, Any],
+        user_id: Optional[int],
+        timeout: Optional[float],
+        deliver: bool
+    ) -> QueuedTask:
+        await self.start()
+
+        task = QueuedTask(
+            task_type,
+            params,
+            user_id,
+            time.time() + (timeout or TASK_DEADLINES[task_type]),
+            deliver=deliver
+        )
+        task.future = asyncio.get_running_loop().create_future()
+        self.tasks[task.id] = task
+
+        # Only tasks whose result is pushed to the user outlive the request
+        if deliver and self.store:
+            await asyncio.to_thread(self.store.add, task)
+
+        self._enqueue(task)
+        return task
+
+    async def _recover(self) -> None:
+        """
+        Periodically heartbeat the tasks this queue owns and claim those
+        of workers that stopped heartbeating
+        """
+        while True:
+            try:
+                await asyncio.to_thread(self.store.heartbeat)
+                claimed = await asyncio.to_thread(
+                    self.store.claim_abandoned,
+                    settings.TASK_OWNER_TIMEOUT
+                )
+            except Exception as e:
+                print(f"Error recovering tasks: {str(e)}")
+                claimed = []
+            for task in claimed:
+                if task.id in self.tasks:
+                    # Claimed back while the old copy is still queued here
+                    continue
+                self.tasks[task.id] = task
+                self._enqueue(task)
+            await asyncio.sleep(settings.TASK_RECOVERY_INTERVAL)
+
+    def _enqueue(self, task: QueuedTask) -> None:
+        self._queue.put_nowait(
+            (TASK_PRIORITIES[task.task_type], next(self._sequence), task)
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, task = await self._queue.get()
+            try:
+                await self._process(task)
+            except Exception as e:
+                # A store error must not take the worker down with it
+                print(f"Error processing task {task.id}: {str(e)}")
+                self.tasks.pop(task.id, None)
+                if task.future and not task.future.done():
+                    task.future.set_result(self._error(task, "Task failed"))
+
+    async def _process(self, task: QueuedTask) -> None:
+        if task.status == "cancelled":
+            await self._finish(task, self._error(task, "Task cancelled"), "cancelled")
+            return
+
+        # Park the task until a slot of its type frees up
+        if self.active[task.task_type] >= TASK_CONCURRENCY[task.task_type]:
+            self.parked[task.task_type].append(task)
+            return
+
+        self.active[task.task_type] += 1
+        try:
+            with TASKS_IN_FLIGHT.track(task_type=task.task_type.value):
+                await self._run(task)
+        finally:
+            self.active[task.task_type] -= 1
+            if self.parked[task.task_type]:
+                self._enqueue(self.parked[task.task_type].popleft())
+
+    async def _run(self, task: QueuedTask) -> None:
+        remaining = task.deadline - time.time()
+        if remaining <= 0:
+            await self._finish(task, self._error(task, "Task deadline exceeded"), "expired")
+            return
+
+        task.status = "running"
+        if task.deliver and self.store:
+            await asyncio.to_thread(self.store.set_status, task.id, "running")
+
+        self.running[task.id] = asyncio.ensure_future(
+            self.executor.execute_task(
+                task.task_type,
+                task.params,
+                process_pool=self.process_pool
+            )
+        )
+        try:
+            result = await asyncio.wait_for(self.running[task.id], remaining)
+            await self._finish(task, result, "done")
+        except asyncio.TimeoutError:
+            await self._finish(task, self._error(task, "Task deadline exceeded"), "expired")
+        except RateLimited as e:
+            if task.deliver:
+                await self._finish(task, self._error(task, str(e)), "rejected")
+            else:
+                # run() raises it so the endpoint answers with a quick busy reply
+                task.status = "rejected"
+                self.tasks.pop(task.id, None)
+                task.future.set_exception(e)
+        except asyncio.CancelledError:
+            if task.status != "cancelled":
+                # Queue is shutting down, the store keeps the task for recovery
+                raise
+            await self._finish(task, self._error(task, "Task cancelled"), "cancelled")
+        finally:
+            self.running.pop(task.id, None)
+
+    async def _finish(self, task: QueuedTask, result: Dict[str, Any], status: str) -> None:
+        task.status = status
+        self.tasks.pop(task.id, None)
+
+        if task.future and not task.future.done():
+            task.future.set_result(result)
+
+        if not task.deliver:
+            return
+
+        if self.store:
+            owned = await asyncio.to_thread(
+                self.store.set_status, task.id, status, result
+            )
+            if not owned:
+                # Another worker took the task over and will deliver it
+                return
+
+        if self.deliver and task.user_id is not None:
+            try:
+                await self.deliver(task.user_id, {"task_id": task.id, **result})
+            except Exception as e:
+                print(f"Error delivering task {task.id}: {e}")
+
+    def _error(self, task: QueuedTask, message: str) -> Dict[str, Any]:
+        return {
+            "status": "error",
+            "task_type": task.task_type.value,
+            "error": message,
+            "timestamp": datetime.utcnow().isoformat()
+        }
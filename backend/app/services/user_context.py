@@ -1,12 +1,15 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import json
 from sqlalchemy.orm import Session
 from ..models.user import User
 from ..core.database import get_db
+from .interaction_log import InteractionLog
+from .shortcuts import SHORTCUT_TASK_TYPE
 
 class UserContextManager:
-    def __init__(self):
+    def __init__(self, interaction_log: Optional[InteractionLog] = None):
+        self.interaction_log = interaction_log
         self.short_term_memory: Dict[int, List[Dict]] = {}
         self.max_memory_size = 50
         self.memory_expiry = timedelta(hours=1)
@@ -15,7 +18,9 @@ class UserContextManager:
         """
         Get combined short-term and long-term context for a user
         """
-        # Get short-term memory
+        # Get short-term memory, rebuilt from the log after a restart
+        if user_id not in self.short_term_memory and self.interaction_log:
+            await self._restore_short_term_memory(user_id)
         short_term = self._get_short_term_memory(user_id)
         
         # Get long-term preferences from database
@@ -40,6 +45,10 @@ class UserContextManager:
         """
         # Update short-term memory
         self._update_short_term_memory(user_id, command, result)
+
+        # Append to the interaction log
+        if self.interaction_log:
+            self.interaction_log.record(user_id, command, result)
         
         # Update long-term preferences in database
         await self._update_long_term_memory(user_id, command, result)
@@ -60,6 +69,22 @@ class UserContextManager:
         
         return self.short_term_memory[user_id]
 
+    async def _restore_short_term_memory(self, user_id: int) -> None:
+        """
+        Load the user's latest interactions from the log
+        """
+        try:
+            recent = await self.interaction_log.recent(user_id, self.max_memory_size)
+        except Exception as e:
+            print(f"Error loading interactions: {str(e)}")
+            # Don't retry every turn, the user starts from an empty memory
+            self.short_term_memory.setdefault(user_id, [])
+            return
+
+        # Interactions recorded while we were loading are newer
+        self.short_term_memory[user_id] = recent + self.short_term_memory.get(user_id, [])
+        del self.short_term_memory[user_id][:-self.max_memory_size]
+
     def _update_short_term_memory(
         self,
         user_id: int,
@@ -104,10 +129,17 @@ class UserContextManager:
         commands[command] = commands.get(command, 0) + 1
         user.frequently_used_commands = commands
         
-        # Update preferences based on task type
+        # Update preferences based on task type; a shortcut macro
+        # counts as each of the tasks it ran
         preferences = user.preferences or {}
-        task_type = result.get("task_type")
-        if task_type:
+        if result.get("task_type") == SHORTCUT_TASK_TYPE:
+            steps = result["result"]["steps"]
+        else:
+            steps = [result]
+        for step in steps:
+            task_type = step.get("task_type")
+            if not task_type:
+                continue
             if task_type not in preferences:
                 preferences[task_type] = {}
             
@@ -115,7 +147,7 @@ class UserContextManager:
             self._update_task_preferences(
                 preferences[task_type],
                 command,
-                result
+                step
             )
             
         user.preferences = preferences
@@ -1,13 +1,30 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, RateLimitError
 import asyncio
 import base64
-from typing import Optional
+from typing import Optional, List
 from ..core.config import settings
+from ..core.metrics import UPSTREAM_ERRORS
+from ..core.rate_limit import admission, RateLimited
+from .single_flight import SingleFlight
+from .audio_cache import AudioCache
 
 class VoiceProcessor:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL
+        )
+        self.single_flight = SingleFlight("tts")
+        self.audio_cache = AudioCache(
+            settings.TTS_CACHE_DIR,
+            settings.TTS_CACHE_MEMORY_BYTES,
+            settings.TTS_CACHE_DISK_BYTES
+        )
+
+    async def close(self):
+        """Close the upstream HTTP connection pool"""
+        await self.client.close()
+
     async def transcribe_audio(self, audio_file: bytes) -> dict:
         """
         Transcribe audio using Whisper API
@@ -16,18 +33,26 @@ class VoiceProcessor:
             # Convert audio bytes to base64
             audio_base64 = base64.b64encode(audio_file).decode('utf-8')
             
-            response = await self.client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language="en"
-            )
+            async with admission.upstream("openai") as slot:
+                try:
+                    response = await self.client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=("audio.wav", audio_file),
+                        language="en"
+                    )
+                except RateLimitError:
+                    slot.mark_overloaded()
+                    raise
             
             return {
                 "status": "success",
                 "text": response.text,
-                "language": response.language
+                "language": getattr(response, "language", "en")
             }
+        except RateLimited:
+            raise
         except Exception as e:
+            UPSTREAM_ERRORS.inc(upstream="openai", operation="transcribe")
             return {
                 "status": "error",
                 "error": str(e)
@@ -37,15 +62,55 @@ class VoiceProcessor:
         """
         Convert text to speech using OpenAI TTS
         """
-        try:
-            response = await self.client.audio.speech.create(
-                model="tts-1",
-                voice="alloy",
-                input=text
+        text = text.strip()
+        key = AudioCache.key(text, settings.TTS_VOICE, settings.TTS_MODEL)
+        audio = self.audio_cache.get_memory(key)
+        if audio is None:
+            audio = await asyncio.to_thread(self.audio_cache.get, key)
+        if audio is not None:
+            return audio
+
+        # Identical phrases requested at the same time share one upstream call
+        return await self.single_flight.do(key, lambda: self._synthesize(text, key))
+
+    async def prewarm(self, phrases: List[str], concurrency: int = 4) -> None:
+        """
+        Synthesize phrases that aren't cached yet, a few at a time
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(phrase: str):
+            async with semaphore:
+                await self.text_to_speech(phrase)
+
+        await asyncio.gather(*[
+            warm(phrase) for phrase in phrases
+            if not self.audio_cache.contains(
+                AudioCache.key(phrase.strip(), settings.TTS_VOICE, settings.TTS_MODEL)
             )
-            
+        ])
+
+    async def _synthesize(self, text: str, key: str) -> Optional[bytes]:
+        try:
+            async with admission.upstream("openai") as slot:
+                try:
+                    response = await self.client.audio.speech.create(
+                        model=settings.TTS_MODEL,
+                        voice=settings.TTS_VOICE,
+                        input=text
+                    )
+                except RateLimitError:
+                    slot.mark_overloaded()
+                    raise
+
+            if response.content:
+                await asyncio.to_thread(self.audio_cache.put, key, response.content)
             return response.content
             
+        except RateLimited:
+            # Answer without audio rather than wait for a busy upstream
+            return None
         except Exception as e:
+            UPSTREAM_ERRORS.inc(upstream="openai", operation="tts")
             print(f"TTS Error: {str(e)}")
             return None 
\ No newline at end of file
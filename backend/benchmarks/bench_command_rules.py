@@ -0,0 +1,132 @@
+"""
+Micro-benchmark for smart home command parsing.
+
+Compares the compiled CommandRules engine against the previous per-call
+keyword dict scan over a corpus of real commands.
+
+Usage (from backend/):
+    python -m benchmarks.bench_command_rules [--iterations 2000]
+"""
+import argparse
+import re
+import time
+from app.services.command_rules import CommandRules
+from app.services.smart_home import DeviceType, DeviceAction
+
+CORPUS = [
+    "turn on the lights",
+    "switch on the light",
+    "switch off the lamp",
+    "turn on the security light",
+    "turn off the living room lamp",
+    "dim the bedroom lights",
+    "set the light brightness to 40%",
+    "turn on the kitchen light at full brightness",
+    "unlock the door",
+    "unlock the front door please",
+    "lock the back door",
+    "is the front door locked",
+    "open the garage door",
+    "set the temperature to 72 degrees",
+    "set thermostat to 21.5°c",
+    "change to 68 f",
+    "adjust the heat to 70",
+    "turn off the ac",
+    "turn on the air conditioning",
+    "activate the security camera",
+    "disable the front camera",
+    "check the camera status",
+    "turn on the coffee maker plug",
+    "switch off the outlet by the tv",
+    "enable the hallway switch",
+    "could you turn the lights off in the study",
+    "make it a bit warmer, set heating to 23 celsius",
+]
+
+
+def legacy_identify_device_type(command):
+    device_keywords = {
+        DeviceType.LIGHT: ["light", "lamp", "bulb"],
+        DeviceType.THERMOSTAT: ["thermostat", "temperature", "ac", "heat"],
+        DeviceType.LOCK: ["lock", "door"],
+        DeviceType.SWITCH: ["switch", "plug", "outlet"],
+        DeviceType.CAMERA: ["camera", "cam", "security"]
+    }
+    for device_type, keywords in device_keywords.items():
+        if any(keyword in command for keyword in keywords):
+            return device_type
+    return None
+
+
+def legacy_identify_device_action(command):
+    action_keywords = {
+        DeviceAction.TURN_ON: ["turn on", "enable", "activate"],
+        DeviceAction.TURN_OFF: ["turn off", "disable", "deactivate"],
+        DeviceAction.SET_TEMPERATURE: ["set", "change to", "adjust"],
+        DeviceAction.LOCK: ["lock", "secure"],
+        DeviceAction.UNLOCK: ["unlock", "open"]
+    }
+    for action, keywords in action_keywords.items():
+        if any(keyword in command for keyword in keywords):
+            return action
+    return None
+
+
+def legacy_extract_parameters(command, device_type):
+    params = {}
+    if device_type == DeviceType.THERMOSTAT:
+        import re
+        temp_match = re.search(r'(\d+)\s*(?:degrees?|°)?', command)
+        if temp_match:
+            params["temperature"] = float(temp_match.group(1))
+    elif device_type == DeviceType.LIGHT:
+        for keyword, value in {"dim": 30, "bright": 100, "medium": 50}.items():
+            if keyword in command:
+                params["brightness"] = value
+                break
+    return params
+
+
+def run_legacy(command):
+    device_type = legacy_identify_device_type(command)
+    action = legacy_identify_device_action(command)
+    return device_type, action, legacy_extract_parameters(command, device_type)
+
+
+def run_compiled(rules, command):
+    device_type, action = rules.parse(command)
+    params = rules.extract_parameters(command, device_type, {}) if device_type else {}
+    return device_type, action, params
+
+
+def measure(name, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for command in CORPUS:
+            fn(command)
+    elapsed = time.perf_counter() - start
+    per_command = elapsed / (iterations * len(CORPUS)) * 1e6
+    print(f"{name:<10} {elapsed:8.3f}s total  {per_command:8.2f}us/command")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    rules = CommandRules.load()
+
+    print("Parsed corpus (legacy -> compiled):")
+    for command in CORPUS:
+        legacy = run_legacy(command)
+        compiled = run_compiled(rules, command)
+        marker = " " if legacy == compiled else "*"
+        print(f" {marker} {command!r}\n      {legacy}\n      {compiled}")
+    print()
+
+    measure("legacy", run_legacy, args.iterations)
+    measure("compiled", lambda command: run_compiled(rules, command), args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Login throughput benchmark.
+
+Simulates a burst of logins and reports how many bcrypt verifications per
+second complete, and how long the event loop stalls meanwhile. The
+"inline" mode calls pwd_context.verify directly, as login used to.
+"offloaded" goes through security.verify_password.
+
+Usage (from backend/):
+    python -m benchmarks.bench_login [--logins 200]
+"""
+import argparse
+import asyncio
+import time
+from app.core.security import pwd_context, verify_password
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Return the worst delay seen by a task that wants to wake every interval"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def inline_verify(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+
+async def run(name: str, verify, logins: int, hashed: str) -> None:
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *[verify("correct horse battery staple", hashed) for _ in range(logins)]
+    )
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    worst_lag = await lag_task
+    assert all(results)
+
+    print(
+        f"{name:<10} {logins / elapsed:8.1f} logins/s  "
+        f"{elapsed:6.2f}s total  worst loop stall {worst_lag * 1000:8.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    args = parser.parse_args()
+
+    hashed = pwd_context.hash("correct horse battery staple")
+
+    await run("inline", inline_verify, args.logins, hashed)
+    await run("offloaded", verify_password, args.logins, hashed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,149 @@
+"""
+Micro-benchmark for the WebSocket wire protocols.
+
+Reports bytes on the wire and encode/decode CPU time per message for each
+protocol, against the previous double-encoded JSON frames. The frame
+header the WebSocket layer adds (2-10 bytes) is included, permessage-
+deflate is not.
+
+Usage (from backend/):
+    python -m benchmarks.bench_protocol [--iterations 2000]
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from app.core.ws_protocol import WireProtocol, SUBPROTOCOLS, format_available
+
+
+def task_result(task_type, result):
+    return {
+        "status": "success",
+        "task_type": task_type,
+        "result": result,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+MESSAGES = {
+    "device ack": task_result("smart_home", {
+        "message": "Successfully turn_on light",
+        "device_id": "light_living_room",
+        "state": {"power": "on", "brightness": 80}
+    }),
+    "busy": {"type": "error", "code": 429, "message": "busy", "retry_after": 0.85},
+    "search results": task_result("web_search", {
+        "message": "Here's what I found",
+        "results": [
+            {
+                "title": f"Result {i}: how to descale an espresso machine",
+                "url": f"https://example.com/articles/espresso-descaling-guide-{i}",
+                "snippet": "Run a descaling solution through the group head and "
+                           "steam wand, then flush with fresh water twice. " * 2
+            }
+            for i in range(10)
+        ]
+    }),
+    "code assist": task_result("code_assist", {
+        "message": "Code assist task handled",
+        "code": "\n".join(
+            f"def handler_{i}(event):\n    return process(event, retries={i})"
+            for i in range(40)
+        )
+    })
+}
+
+
+def frame_header(size):
+    if size < 126:
+        return 2
+    return 4 if size < 65536 else 10
+
+
+def legacy_encode(message):
+    return json.dumps({"type": "message", "content": json.dumps(message)})
+
+
+def legacy_decode(frame):
+    envelope = json.loads(frame)
+    return json.loads(envelope["content"])
+
+
+def protocol_codec(protocol):
+    def encode(message):
+        text, data, _ = protocol.encode({"type": "message", "content": message})
+        return text if text is not None else data
+
+    def decode(frame):
+        if isinstance(frame, str):
+            return protocol.decode(frame, None)
+        return protocol.decode(None, frame)
+
+    return encode, decode
+
+
+def wire_size(frame):
+    size = len(frame.encode()) if isinstance(frame, str) else len(frame)
+    return size + frame_header(size)
+
+
+def encoded_size(protocol, message):
+    _, _, size = protocol.encode(message)
+    return size + frame_header(size)
+
+
+def measure(encode, decode, message, iterations):
+    frame = encode(message)
+
+    start = time.process_time()
+    for _ in range(iterations):
+        encode(message)
+    encode_us = (time.process_time() - start) / iterations * 1e6
+
+    start = time.process_time()
+    for _ in range(iterations):
+        decode(frame)
+    decode_us = (time.process_time() - start) / iterations * 1e6
+
+    return wire_size(frame), encode_us, decode_us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=10,
+                        help="small messages per batch in the batching comparison")
+    args = parser.parse_args()
+
+    codecs = {"legacy (double json)": (legacy_encode, legacy_decode)}
+    codecs["legacy"] = protocol_codec(WireProtocol())
+    for name, (wire_format, compress) in SUBPROTOCOLS.items():
+        if format_available(wire_format):
+            codecs[name] = protocol_codec(WireProtocol(wire_format, compress, batching=True))
+        else:
+            print(f"{name}: {wire_format} library not installed, skipped")
+
+    for label, message in MESSAGES.items():
+        print(f"\n{label}")
+        print(f"  {'protocol':<22}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+        for name, (encode, decode) in codecs.items():
+            size, encode_us, decode_us = measure(encode, decode, message, args.iterations)
+            print(f"  {name:<22}{size:>8}{encode_us:>12.2f}{decode_us:>12.2f}")
+
+    small = MESSAGES["device ack"]
+    print(f"\n{args.batch} device acks, separate frames vs one batch frame")
+    for name, (wire_format, compress) in SUBPROTOCOLS.items():
+        if not format_available(wire_format):
+            continue
+        protocol = WireProtocol(wire_format, compress, batching=True)
+        envelope = {"type": "message", "content": small}
+        separate = sum(
+            encoded_size(protocol, envelope) for _ in range(args.batch)
+        )
+        batch = {"type": "batch", "messages": [envelope] * args.batch}
+        batched = encoded_size(protocol, batch)
+        print(f"  {name:<22}{separate:>8} bytes in {args.batch} frames -> {batched:>6} bytes in 1")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+In-process stand-in for a paho MQTT client and broker.
+
+Implements the subset of paho.mqtt.client.Client used by
+SmartHomeController. Every command published to home/<type>/<id>/set is
+acknowledged after a configurable delay by a state message on
+home/<type>/<id>, delivered from a background thread like paho's
+network loop.
+"""
+import heapq
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4
+
+
+class InMemoryMQTTClient:
+    def __init__(self, ack_latency: float = 0.05, ack_jitter: float = 0.02, drop_rate: float = 0.0):
+        self.ack_latency = ack_latency
+        self.ack_jitter = ack_jitter
+        self.drop_rate = drop_rate
+
+        self.on_connect = None
+        self.on_message = None
+        self.subscriptions = set()
+        self.connected = False
+        self.published = 0
+
+        self._pending = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def connect_async(self, host, port=1883, keepalive=60):
+        pass
+
+    def loop_start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="fake-mqtt", daemon=True)
+        self._thread.start()
+
+        self.connected = True
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join()
+
+    def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    def subscribe(self, topic, qos=0):
+        self.subscriptions.add(topic)
+        return MQTT_ERR_SUCCESS, 1
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        if not self.connected:
+            return SimpleNamespace(rc=MQTT_ERR_NO_CONN, mid=0)
+
+        self.published += 1
+        if topic.endswith("/set") and random.random() >= self.drop_rate:
+            command = json.loads(payload) if payload else {}
+            state = {key: value for key, value in command.items() if key != "action"}
+            state["last_action"] = command.get("action")
+            delay = max(0.0, random.gauss(self.ack_latency, self.ack_jitter))
+            self._schedule(delay, topic[:-len("/set")], json.dumps(state))
+
+        return SimpleNamespace(rc=MQTT_ERR_SUCCESS, mid=self.published)
+
+    def _schedule(self, delay, topic, payload):
+        with self._condition:
+            self._sequence += 1
+            heapq.heappush(self._pending, (time.monotonic() + delay, self._sequence, topic, payload))
+            self._condition.notify()
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while self._running and (
+                    not self._pending or self._pending[0][0] > time.monotonic()
+                ):
+                    timeout = self._pending[0][0] - time.monotonic() if self._pending else None
+                    self._condition.wait(timeout)
+                if not self._running:
+                    return
+                _, _, topic, payload = heapq.heappop(self._pending)
+
+            if self.on_message:
+                message = SimpleNamespace(topic=topic, payload=payload.encode())
+                self.on_message(self, None, message)
@@ -0,0 +1,184 @@
+"""
+Local stand-in for the OpenAI API used by AIEngine and VoiceProcessor.
+
+Serves chat completions (plain and streamed), speech, transcriptions and
+the model list with configurable latency and error rate, so the backend
+can be load tested without spending real quota.
+
+Transcriptions return the uploaded file decoded as UTF-8, so a load
+generator can choose the "spoken" command by uploading its text.
+
+Usage (from backend/):
+    python -m benchmarks.fake_openai --port 9100 --latency 0.3 --jitter 0.1
+then point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+app = FastAPI()
+
+config = {
+    "latency": 0.3,
+    "jitter": 0.1,
+    "chunk_delay": 0.02,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0
+}
+
+
+async def simulate_upstream():
+    """Sleep for the configured latency, maybe returning an error response"""
+    await asyncio.sleep(max(0.0, random.gauss(config["latency"], config["jitter"])))
+
+    roll = random.random()
+    if roll < config["rate_limit_rate"]:
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+            status_code=429,
+            headers={"retry-after": "1"}
+        )
+    if roll < config["rate_limit_rate"] + config["error_rate"]:
+        return JSONResponse(
+            {"error": {"message": "Upstream error", "type": "server_error"}},
+            status_code=500
+        )
+    return None
+
+
+def reply_for(messages):
+    """Echo the last user message back as an assistant confirmation"""
+    command = next(
+        (message["content"] for message in reversed(messages) if message["role"] == "user"),
+        ""
+    )
+    return f"Okay, I'll {command.strip().rstrip('.')}."
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {
+        "object": "list",
+        "data": [
+            {"id": model, "object": "model", "created": 0, "owned_by": "fake-openai"}
+            for model in ("gpt-4", "gpt-3.5-turbo", "whisper-1", "tts-1")
+        ]
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    error = await simulate_upstream()
+    if error:
+        return error
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "gpt-4")
+    content = reply_for(body.get("messages", []))
+
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": 50,
+                "completion_tokens": len(content.split()),
+                "total_tokens": 50 + len(content.split())
+            }
+        }
+
+    async def stream():
+        for index, word in enumerate(content.split(" ")):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if index == 0 else " " + word},
+                    "finish_reason": None
+                }]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(config["chunk_delay"])
+
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.post("/v1/audio/speech")
+async def speech(request: Request):
+    body = await request.json()
+    error = await simulate_upstream()
+    if error:
+        return error
+
+    # Roughly the size of a real 64kbps clip: ~1KB per word
+    audio = b"ID3" + bytes(1024 * max(1, len(body.get("input", "").split())))
+    return Response(audio, media_type="audio/mpeg")
+
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(file: UploadFile = File(...), model: str = Form("whisper-1")):
+    content = await file.read()
+    error = await simulate_upstream()
+    if error:
+        return error
+
+    return {"text": content.decode("utf-8", errors="ignore").strip()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=config["latency"],
+                        help="mean upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=config["jitter"],
+                        help="standard deviation of the latency")
+    parser.add_argument("--chunk-delay", type=float, default=config["chunk_delay"],
+                        help="delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"],
+                        help="fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=config["rate_limit_rate"],
+                        help="fraction of requests answered with a 429")
+    args = parser.parse_args()
+
+    config.update(
+        latency=args.latency,
+        jitter=args.jitter,
+        chunk_delay=args.chunk_delay,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate
+    )
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
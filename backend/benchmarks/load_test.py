@@ -0,0 +1,274 @@
+"""
+Load generator for the backend.
+
+Drives many concurrent /ws/{user_id} sessions and /process-voice uploads.
+It reports:
+- throughput and client-side p50/p99 per kind
+- p50/p99 per pipeline stage, from the server's /metrics histograms
+- peak server memory
+
+Voice uploads carry the command text as the "audio". benchmarks.fake_openai
+transcribes that back verbatim.
+
+Each WebSocket session logs in as its own user. The server sends a reply
+to every socket of a user, so sessions sharing a user would read each
+other's replies; --users must be at least --ws-sessions.
+
+Usage (from backend/, against benchmarks.serve --users 2000):
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --users 2000 \\
+        --ws-sessions 2000 --commands 5 --voice-requests 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from collections import defaultdict
+import aiohttp
+from .serve import PLACEHOLDER_ENV
+
+COMMANDS = [
+    "turn on the lights",
+    "turn off the living room lamp",
+    "dim the bedroom lights",
+    "unlock the front door",
+    "lock the back door",
+    "set the temperature to 72 degrees",
+    "turn off the ac",
+    "activate the security camera",
+    "what's the weather like today",
+    "tell me a joke",
+    "good morning",
+]
+
+SAMPLE_PATTERN = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+LABEL_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def parse_metrics(text):
+    """Return {(name, labels...): value} from the Prometheus text format"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = SAMPLE_PATTERN.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        key = (name, tuple(sorted(LABEL_PATTERN.findall(labels or ""))))
+        samples[key] = float(value)
+    return samples
+
+
+def histogram_quantile(buckets, fraction):
+    """Estimate a quantile from cumulative (upper bound, count) buckets"""
+    buckets = sorted(buckets)
+    total = buckets[-1][1] if buckets else 0
+    if total <= 0:
+        return 0.0
+
+    rank = fraction * total
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def stage_quantiles(before, after):
+    """p50/p99 per (pipeline, stage) for observations made during the run"""
+    buckets = defaultdict(list)
+    for (name, labels), value in after.items():
+        if name != "qia_stage_duration_seconds_bucket":
+            continue
+        labels = dict(labels)
+        le = float("inf") if labels["le"] == "+Inf" else float(labels["le"])
+        delta = value - before.get((name, tuple(sorted(labels.items()))), 0.0)
+        buckets[(labels["pipeline"], labels["stage"])].append((le, delta))
+
+    return {
+        key: (
+            histogram_quantile(values, 0.5),
+            histogram_quantile(values, 0.99),
+            max(count for _, count in values)
+        )
+        for key, values in buckets.items()
+    }
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, kind, started):
+        self.latencies[kind].append(time.perf_counter() - started)
+
+    def error(self, kind, reason):
+        self.errors[f"{kind}: {reason}"] += 1
+
+
+async def ws_session(session, args, user_id, token, stats, ramp_delay):
+    await asyncio.sleep(ramp_delay)
+    url = f"{args.ws_url}{args.prefix}/ws/{user_id}?token={token}"
+    try:
+        async with session.ws_connect(url, heartbeat=30) as websocket:
+            for _ in range(args.commands):
+                started = time.perf_counter()
+                await websocket.send_str(json.dumps({"text": random.choice(COMMANDS)}))
+                message = await websocket.receive(timeout=args.timeout)
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    stats.error("ws", f"closed ({websocket.close_code})")
+                    return
+                if json.loads(message.data).get("code") == 429:
+                    stats.error("ws", "busy")
+                    continue
+                stats.record("ws", started)
+                if args.think_time:
+                    await asyncio.sleep(random.expovariate(1 / args.think_time))
+    except Exception as e:
+        stats.error("ws", type(e).__name__)
+
+
+async def voice_request(session, args, token, stats, semaphore):
+    async with semaphore:
+        form = aiohttp.FormData()
+        form.add_field(
+            "audio_file",
+            random.choice(COMMANDS).encode(),
+            filename="command.wav",
+            content_type="audio/wav"
+        )
+        started = time.perf_counter()
+        try:
+            async with session.post(
+                f"{args.url}{args.prefix}/process-voice",
+                data=form,
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=aiohttp.ClientTimeout(total=args.timeout)
+            ) as response:
+                await response.read()
+                if response.status != 200:
+                    stats.error("voice", f"HTTP {response.status}")
+                    return
+            stats.record("voice", started)
+        except Exception as e:
+            stats.error("voice", type(e).__name__)
+
+
+async def sample_memory(session, args, stop, peaks):
+    while not stop.is_set():
+        try:
+            async with session.get(f"{args.url}/metrics") as response:
+                samples = parse_metrics(await response.text())
+            rss = samples.get(("process_resident_memory_bytes", ()), 0.0)
+            peaks.append(rss)
+        except Exception:
+            pass
+        await asyncio.sleep(1)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--prefix", default="/api/v1")
+    parser.add_argument("--users", type=int, default=1000,
+                        help="user ids 1..N, as seeded by benchmarks.serve")
+    parser.add_argument("--ws-sessions", type=int, default=1000)
+    parser.add_argument("--commands", type=int, default=5,
+                        help="commands sent per WebSocket session")
+    parser.add_argument("--think-time", type=float, default=0.5,
+                        help="mean pause between commands in a session")
+    parser.add_argument("--voice-requests", type=int, default=200)
+    parser.add_argument("--voice-concurrency", type=int, default=50)
+    parser.add_argument("--ramp", type=float, default=5.0,
+                        help="seconds over which sessions are opened")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    if args.ws_sessions > args.users:
+        parser.error("--ws-sessions needs one user per session, raise --users")
+    args.ws_url = args.url.replace("http", "ws", 1)
+
+    # Only the token signing key matters here, it must match the server's
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from app.core.security import create_access_token
+    tokens = {
+        user_id: create_access_token({"sub": str(user_id)})
+        for user_id in range(1, args.users + 1)
+    }
+
+    stats = Stats()
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.get(f"{args.url}/metrics") as response:
+            before = parse_metrics(await response.text())
+
+        stop = asyncio.Event()
+        memory = []
+        memory_task = asyncio.create_task(sample_memory(session, args, stop, memory))
+
+        semaphore = asyncio.Semaphore(args.voice_concurrency)
+        started = time.perf_counter()
+        jobs = [
+            ws_session(
+                session,
+                args,
+                index + 1,
+                tokens[index + 1],
+                stats,
+                random.uniform(0, args.ramp)
+            )
+            for index in range(args.ws_sessions)
+        ] + [
+            voice_request(session, args, random.choice(list(tokens.values())), stats, semaphore)
+            for _ in range(args.voice_requests)
+        ]
+        await asyncio.gather(*jobs)
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await memory_task
+        async with session.get(f"{args.url}/metrics") as response:
+            after = parse_metrics(await response.text())
+
+    print(f"\nRun took {elapsed:.1f}s\n")
+    print(f"{'kind':<8} {'ok':>8} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for kind, latencies in sorted(stats.latencies.items()):
+        print(
+            f"{kind:<8} {len(latencies):>8} {len(latencies) / elapsed:>8.1f} "
+            f"{percentile(latencies, 0.5) * 1000:>9.1f} {percentile(latencies, 0.99) * 1000:>9.1f}"
+        )
+
+    print(f"\n{'pipeline':<12} {'stage':<14} {'count':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for (pipeline, stage), (p50, p99, count) in sorted(stage_quantiles(before, after).items()):
+        if count:
+            print(f"{pipeline:<12} {stage:<14} {int(count):>8} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f}")
+
+    if memory:
+        print(f"\nServer RSS: start {memory[0] / 2**20:.0f} MiB, peak {max(memory) / 2**20:.0f} MiB")
+
+    if stats.errors:
+        print("\nErrors:")
+        for reason, count in sorted(stats.errors.items()):
+            print(f"  {reason}: {count}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+One-shot benchmark: starts benchmarks.fake_openai and benchmarks.serve as
+subprocesses, waits for them, runs benchmarks.load_test and shuts down.
+
+Arguments after "--" go to the load generator.
+
+Usage (from backend/):
+    python -m benchmarks.run --users 2000 --latency 0.3 -- --ws-sessions 2000 --voice-requests 500
+"""
+import argparse
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def wait_for(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def main():
+    argv = sys.argv[1:]
+    load_args = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, load_args = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--openai-port", type=int, default=9100)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--mqtt-ack-latency", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    openai_url = f"http://127.0.0.1:{args.openai_port}"
+    server_url = f"http://127.0.0.1:{args.port}"
+
+    processes = [
+        subprocess.Popen([
+            sys.executable, "-m", "benchmarks.fake_openai",
+            "--port", str(args.openai_port),
+            "--latency", str(args.latency),
+            "--jitter", str(args.jitter),
+            "--error-rate", str(args.error_rate),
+            "--rate-limit-rate", str(args.rate_limit_rate)
+        ]),
+        subprocess.Popen([
+            sys.executable, "-m", "benchmarks.serve",
+            "--port", str(args.port),
+            "--users", str(args.users),
+            "--openai-url", f"{openai_url}/v1",
+            "--mqtt-ack-latency", str(args.mqtt_ack_latency)
+        ])
+    ]
+    try:
+        wait_for(f"{openai_url}/v1/models")
+        wait_for(f"{server_url}/metrics")
+        subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.load_test",
+                "--url", server_url,
+                "--users", str(args.users),
+                *load_args
+            ],
+            check=True
+        )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Run the backend against local stand-ins for its dependencies.
+
+- the model upstream is benchmarks.fake_openai, via OPENAI_BASE_URL
+- the MQTT broker is replaced by benchmarks.fake_mqtt.InMemoryMQTTClient
+- the database is a fresh SQLite file seeded with --users users
+
+All users share the password "benchmark".
+
+Usage (from backend/):
+    python -m benchmarks.serve --port 8000 --users 1000 \\
+        --openai-url http://127.0.0.1:9100/v1
+"""
+import argparse
+import os
+import tempfile
+
+# Required settings the benchmark never uses against a real service
+PLACEHOLDER_ENV = {
+    "OPENAI_API_KEY": "benchmark",
+    "SECRET_KEY": "benchmark-secret",
+    "FIREBASE_CREDENTIALS": "benchmark",
+    "WHISPER_API_KEY": "benchmark"
+}
+
+
+def configure_environment(args) -> None:
+    """Settings are read at import time, so set them before importing app"""
+    workdir = args.workdir or tempfile.mkdtemp(prefix="qia-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'qia.db')}"
+    os.environ["TASK_QUEUE_DB"] = os.path.join(workdir, "task_queue.db")
+    os.environ["OPENAI_BASE_URL"] = args.openai_url
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+
+
+def seed_users(count: int) -> None:
+    from app.core.database import engine, SessionLocal
+    from app.core.security import pwd_context
+    from app.models.user import User
+    from app.models.interaction import Interaction  # noqa: F401, registers the table
+
+    User.metadata.drop_all(engine)
+    User.metadata.create_all(engine)
+
+    hashed_password = pwd_context.hash("benchmark")
+    db = SessionLocal()
+    try:
+        db.bulk_save_objects([
+            User(
+                id=user_id,
+                email=f"user{user_id}@bench.local",
+                hashed_password=hashed_password,
+                full_name=f"Bench User {user_id}",
+                preferences={},
+                frequently_used_commands={},
+                custom_shortcuts={}
+            )
+            for user_id in range(1, count + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--openai-url", default="http://127.0.0.1:9100/v1")
+    parser.add_argument("--mqtt-ack-latency", type=float, default=0.05)
+    parser.add_argument("--mqtt-drop-rate", type=float, default=0.0)
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    configure_environment(args)
+    seed_users(args.users)
+
+    from app.main import app
+    from app.services.container import services
+    from app.services.smart_home import SmartHomeController
+    from .fake_mqtt import InMemoryMQTTClient
+
+    # Swap the broker before the lifespan connects the shared controller
+    services.smart_home = SmartHomeController(
+        mqtt_client=InMemoryMQTTClient(
+            ack_latency=args.mqtt_ack_latency,
+            drop_rate=args.mqtt_drop_rate
+        )
+    )
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
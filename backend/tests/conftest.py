@@ -0,0 +1,12 @@
+"""
+Test settings: the app reads its configuration at import time, so the
+required values are filled in before any test module imports it.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("FIREBASE_CREDENTIALS", "test")
+os.environ.setdefault("WHISPER_API_KEY", "test")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("TASK_QUEUE_DB", os.path.join(tempfile.mkdtemp(), "task_queue.db"))
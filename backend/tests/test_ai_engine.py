@@ -0,0 +1,129 @@
+"""
+Model calls: hedging, escalation to the primary model and the circuit
+breaker, against a fake OpenAI client.
+
+Usage (from backend/):
+    python -m pytest tests
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+import httpx
+import pytest
+from openai import APIConnectionError, APIStatusError, RateLimitError
+from app.core.config import settings
+from app.core.rate_limit import admission
+from app.services.ai_engine import AIEngine, DEGRADED_GENERAL_MESSAGE
+from app.services.model_router import CircuitBreaker
+
+REQUEST = httpx.Request("POST", "https://api.openai.test/v1/chat/completions")
+
+
+def reply(content, finish_reason="stop"):
+    return SimpleNamespace(choices=[SimpleNamespace(
+        message=SimpleNamespace(content=content),
+        finish_reason=finish_reason
+    )])
+
+
+def status_error(cls, code):
+    return cls("upstream said no", response=httpx.Response(code, request=REQUEST), body=None)
+
+
+class FakeCompletions:
+    """Plays the scripted outcomes in order, one per call"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    async def create(self, model, messages, **kwargs):
+        self.calls.append(model)
+        delay, outcome = self.outcomes.pop(0)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGE_DEFAULT_DELAY", 0.05)
+    monkeypatch.setattr(settings, "AI_HEDGE_MIN_DELAY", 0.01)
+    monkeypatch.setattr(settings, "AI_REQUEST_TIMEOUT", 2.0)
+    return AIEngine()
+
+
+def run(engine, outcomes, command="tell me a joke"):
+    completions = FakeCompletions(outcomes)
+    engine.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return asyncio.run(engine.process_command(command)), completions.calls
+
+
+def test_slow_call_is_hedged(engine):
+    start = time.monotonic()
+    result, calls = run(engine, [(1.0, reply("slow")), (0.01, reply("fast"))])
+    assert result["response"] == "fast"
+    assert calls == [settings.AI_FAST_MODEL] * 2
+    assert time.monotonic() - start < 0.5
+
+
+def test_no_hedge_while_callers_wait_for_a_slot(engine, monkeypatch):
+    monkeypatch.setattr(admission, "saturated", lambda name: True)
+    result, calls = run(engine, [(0.2, reply("only"))])
+    assert result["response"] == "only"
+    assert len(calls) == 1
+
+
+def test_connection_error_is_retried_at_once(engine):
+    result, calls = run(engine, [
+        (0, APIConnectionError(request=REQUEST)),
+        (0, reply("second try"))
+    ])
+    assert result["response"] == "second try"
+    assert len(calls) == 2
+
+
+def test_upstream_rate_limit_is_not_retried(engine):
+    result, calls = run(engine, [(0, status_error(RateLimitError, 429))])
+    assert len(calls) == 1
+    assert result["degraded"] and result["error_type"] == "rate_limited"
+    assert result["response"] == DEGRADED_GENERAL_MESSAGE
+
+
+def test_bad_request_is_not_retried(engine):
+    result, calls = run(engine, [(0, status_error(APIStatusError, 400))])
+    assert len(calls) == 1
+    assert result["status"] == "error" and result["error_type"] == "bad_request"
+
+
+def test_weak_fast_answer_escalates_to_primary_model(engine):
+    result, calls = run(engine, [
+        (0, reply("I'm not sure what you mean")),
+        (0, reply("Here is a joke"))
+    ])
+    assert calls == [settings.AI_FAST_MODEL, settings.AI_PRIMARY_MODEL]
+    assert result["response"] == "Here is a joke"
+    assert result["model"] == settings.AI_PRIMARY_MODEL
+
+
+def test_open_breaker_answers_degraded_without_calling(engine):
+    engine.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    engine.breaker.record_failure()
+    result, calls = run(engine, [])
+    assert calls == []
+    assert result["error_type"] == "circuit_open"
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.status() == {"state": "closed", "failures": 0}
@@ -0,0 +1,41 @@
+"""
+Behaviour checks for CommandRules on commands that have been parsed wrong.
+
+Usage (from backend/):
+    python -m pytest tests
+"""
+import pytest
+from app.services.command_rules import CommandRules
+from app.services.smart_home import DeviceType, DeviceAction
+
+rules = CommandRules.load()
+
+
+@pytest.mark.parametrize("command, device_type, action", [
+    ("switch on the light", DeviceType.LIGHT, DeviceAction.TURN_ON),
+    ("switch on the lights", DeviceType.LIGHT, DeviceAction.TURN_ON),
+    ("switch off the lamp", DeviceType.LIGHT, DeviceAction.TURN_OFF),
+    ("switch off the outlet by the tv", DeviceType.SWITCH, DeviceAction.TURN_OFF),
+    ("enable the hallway switch", DeviceType.SWITCH, DeviceAction.TURN_ON),
+    ("turn on the security light", DeviceType.LIGHT, DeviceAction.TURN_ON),
+    ("disable the security camera", DeviceType.CAMERA, DeviceAction.TURN_OFF),
+    ("activate the security", DeviceType.CAMERA, DeviceAction.TURN_ON),
+    ("unlock the door", DeviceType.LOCK, DeviceAction.UNLOCK),
+    ("unlock the front door please", DeviceType.LOCK, DeviceAction.UNLOCK),
+    ("lock the back door", DeviceType.LOCK, DeviceAction.LOCK),
+    ("set thermostat to 21.5°c", DeviceType.THERMOSTAT, DeviceAction.SET_TEMPERATURE),
+    ("check the lock", DeviceType.LOCK, DeviceAction.GET_STATUS),
+    ("unlock the lock", DeviceType.LOCK, DeviceAction.UNLOCK),
+    ("lock the lock", DeviceType.LOCK, DeviceAction.LOCK),
+    ("what is the status of the lock", DeviceType.LOCK, DeviceAction.GET_STATUS),
+    ("check the lock status", DeviceType.LOCK, DeviceAction.GET_STATUS),
+])
+def test_device_and_action(command, device_type, action):
+    assert rules.parse(command) == (device_type, action)
+    assert rules.identify_device_type(command) == device_type
+    assert rules.identify_device_action(command) == action
+
+
+def test_no_device():
+    assert rules.parse("turn on") == (None, DeviceAction.TURN_ON)
+    assert rules.parse("what a lovely day") == (None, None)
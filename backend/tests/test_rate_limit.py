@@ -0,0 +1,136 @@
+"""
+Admission control: token buckets, the adaptive upstream limiter and how
+device commands use it.
+
+Usage (from backend/):
+    python -m pytest tests
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.core.rate_limit import (
+    AdaptiveLimiter,
+    KeyedTokenBuckets,
+    RateLimited,
+    TokenBucket,
+    admission,
+    PRIORITY_CHAT,
+    PRIORITY_DEVICE
+)
+from app.services.smart_home import SmartHomeController, DeviceType, DeviceAction
+
+
+def test_token_bucket_allows_burst_then_refuses():
+    bucket = TokenBucket(rate=1, burst=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    assert 0 < bucket.retry_after() <= 1
+
+
+def test_keyed_buckets_limit_each_key_and_forget_old_ones():
+    buckets = KeyedTokenBuckets(rate=0.001, burst=1, max_keys=2)
+    buckets.try_acquire("a", "user")
+    with pytest.raises(RateLimited) as limited:
+        buckets.try_acquire("a", "user")
+    assert limited.value.scope == "user"
+
+    buckets.try_acquire("b", "user")
+    buckets.try_acquire("c", "user")
+    assert list(buckets.buckets) == ["b", "c"]
+
+
+def limiter(**overrides):
+    options = dict(maximum=8, target_latency=1.0, max_queue=4, max_wait=1.0)
+    options.update(overrides)
+    return AdaptiveLimiter("test", **options)
+
+
+def test_waiters_are_served_by_priority():
+    async def scenario():
+        upstream = limiter(maximum=4)
+        assert upstream.limit == 1
+        await upstream.acquire(PRIORITY_CHAT)
+
+        order = []
+
+        async def call(priority, name):
+            await upstream.acquire(priority)
+            order.append(name)
+            upstream.release(0.01)
+
+        waiting = [
+            asyncio.ensure_future(call(PRIORITY_CHAT, "chat")),
+            asyncio.ensure_future(call(PRIORITY_DEVICE, "device"))
+        ]
+        await asyncio.sleep(0)
+        upstream.release(0.01)
+        await asyncio.gather(*waiting)
+        return order
+
+    assert asyncio.run(scenario()) == ["device", "chat"]
+
+
+def test_full_queue_and_long_waits_are_rejected():
+    async def scenario():
+        upstream = limiter(maximum=4, max_queue=1, max_wait=0.05)
+        await upstream.acquire(PRIORITY_CHAT)
+        queued = asyncio.ensure_future(upstream.acquire(PRIORITY_CHAT))
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimited):
+            await upstream.acquire(PRIORITY_CHAT)
+        with pytest.raises(RateLimited):
+            await queued
+        assert upstream.waiters == []
+        assert upstream.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_limit_grows_on_success_and_backs_off_on_overload():
+    async def scenario():
+        upstream = limiter(maximum=16)
+        start = upstream.limit
+        await upstream.acquire(PRIORITY_CHAT)
+        upstream.release(0.01)
+        grown = upstream.limit
+        await upstream.acquire(PRIORITY_CHAT)
+        upstream.release(0.01, overloaded=True)
+        return start, grown, upstream.limit
+
+    start, grown, cut = asyncio.run(scenario())
+    assert grown > start
+    assert cut == pytest.approx(grown * 0.7)
+
+
+class SilentMQTTClient:
+    """Accepts every publish, no device ever answers"""
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        return SimpleNamespace(rc=0, mid=1)
+
+
+def test_silent_device_neither_holds_nor_shrinks_the_mqtt_limit():
+    async def scenario():
+        mqtt_limiter = admission.limiters["mqtt"]
+        limit = mqtt_limiter.limit
+        controller = SmartHomeController(SilentMQTTClient())
+        command = asyncio.ensure_future(
+            controller.execute_command(DeviceType.LIGHT, DeviceAction.TURN_ON)
+        )
+        await asyncio.sleep(0.05)
+        # Waiting for the ack without holding a slot
+        assert not command.done()
+        assert mqtt_limiter.in_flight == 0
+        command.cancel()
+        await asyncio.gather(command, return_exceptions=True)
+        assert controller.ack_waiters == {}
+        return limit, mqtt_limiter.limit
+
+    limit, after = asyncio.run(scenario())
+    assert after >= limit
+
+
+def test_device_command_over_the_mqtt_quota_is_rate_limited(monkeypatch):
+    monkeypatch.setitem(admission.quotas, "mqtt", TokenBucket(rate=1, burst=0))
+    controller = SmartHomeController(SilentMQTTClient())
+    with pytest.raises(RateLimited):
+        asyncio.run(controller.execute_command(DeviceType.LIGHT, DeviceAction.TURN_ON))
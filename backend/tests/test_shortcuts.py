@@ -0,0 +1,133 @@
+"""
+Shortcut matching and execution, and the reply spoken for task results.
+
+Usage (from backend/):
+    python -m pytest tests
+"""
+import asyncio
+from app.services.pipeline import reply_message
+from app.services.shortcuts import (
+    ShortcutIndex,
+    ShortcutRegistry,
+    SHORTCUT_TASK_TYPE,
+    execute_shortcut
+)
+from app.services.task_executor import TaskType, TASK_FAILED_MESSAGE
+
+
+class FakeQueue:
+    def __init__(self, results):
+        self.results = list(results)
+        self.commands = []
+
+    async def run(self, task_type, params, user_id):
+        self.commands.append(params["command"])
+        return self.results.pop(0)
+
+
+def success(message):
+    return {"status": "success", "task_type": "smart_home", "result": {"message": message}}
+
+
+def failure(error="device offline"):
+    return {"status": "error", "task_type": "smart_home", "error": error}
+
+
+def test_literal_pattern_matches_whole_command_only():
+    index = ShortcutIndex({"movie night": "turn off the lights"})
+
+    match = index.match("Movie night!")
+    assert match.name == "movie night"
+    assert match.commands() == [(TaskType.SMART_HOME, "turn off the lights")]
+    assert index.match("movie") is None
+    assert index.match("movie night now") is None
+
+
+def test_slot_captures_several_words():
+    index = ShortcutIndex({
+        "warm up the {room}": {"command": "set the {room} thermostat to 22 degrees"}
+    })
+
+    match = index.match("warm up the living room")
+    assert match.params == {"room": "living room"}
+    assert match.commands() == [
+        (TaskType.SMART_HOME, "set the living room thermostat to 22 degrees")
+    ]
+
+
+def test_slot_backtracks_to_let_later_literals_match():
+    index = ShortcutIndex({"set {room} to {value}": "set the {room} thermostat to {value}"})
+
+    # "to" also appears inside the room name, the first split that fits wins
+    match = index.match("set room to the left to 21")
+    assert match.params == {"room": "room", "value": "the left to 21"}
+
+    match = index.match("set living room to 20")
+    assert match.params == {"room": "living room", "value": "20"}
+    assert index.match("set living room 20") is None
+
+
+def test_literal_words_win_over_slots():
+    index = ShortcutIndex({
+        "good {time}": "turn on the lights",
+        "good night": "turn off the lights"
+    })
+
+    assert index.match("good night").name == "good night"
+    assert index.match("good morning").params == {"time": "morning"}
+
+
+def test_invalid_definitions_are_skipped():
+    index = ShortcutIndex({
+        "bad type": {"command": "x", "task_type": "nope"},
+        "no steps": [],
+        "": "turn on the lights",
+        "lights on": "turn on the lights"
+    })
+
+    assert index.match("bad type") is None
+    assert index.match("no steps") is None
+    assert index.match("lights on").name == "lights on"
+
+
+def test_registry_rebuilds_index_only_on_change():
+    registry = ShortcutRegistry(max_users=1)
+    shortcuts = {"lights on": "turn on the lights"}
+
+    index = registry.index_for(1, shortcuts)
+    assert registry.index_for(1, dict(shortcuts)) is index
+    assert registry.index_for(1, {"lights off": "turn off the lights"}) is not index
+
+    registry.index_for(2, shortcuts)
+    assert list(registry.indexes) == [2]
+    assert registry.match(2, None, "lights on") is None
+
+
+def test_macro_joins_successful_step_messages():
+    index = ShortcutIndex({"movie night": ["dim the lights", "turn on the tv plug"]})
+    queue = FakeQueue([success("Lights dimmed"), failure()])
+
+    result = asyncio.run(execute_shortcut(queue, index.match("movie night"), 1))
+
+    assert queue.commands == ["dim the lights", "turn on the tv plug"]
+    assert result["status"] == "error"
+    assert result["task_type"] == SHORTCUT_TASK_TYPE
+    assert result["result"]["message"] == "Lights dimmed"
+    assert len(result["result"]["steps"]) == 2
+
+
+def test_macro_with_every_step_failed_still_has_a_message():
+    index = ShortcutIndex({"movie night": ["dim the lights", "turn on the tv plug"]})
+    queue = FakeQueue([failure(), failure()])
+
+    result = asyncio.run(execute_shortcut(queue, index.match("movie night"), 1))
+
+    assert result["result"]["message"] == TASK_FAILED_MESSAGE
+
+
+def test_reply_message_for_results_without_a_message():
+    assert reply_message(success("Done")) == "Done"
+    assert reply_message(failure()) == TASK_FAILED_MESSAGE
+    # A task past its queue deadline has no result at all
+    assert reply_message({"status": "error", "error": "Task deadline exceeded"}) == TASK_FAILED_MESSAGE
+    assert reply_message(success("")) == TASK_FAILED_MESSAGE
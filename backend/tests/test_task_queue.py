@@ -0,0 +1,157 @@
+"""
+Lease and recovery behaviour of the persisted task queue.
+
+Usage (from backend/):
+    python -m pytest tests
+"""
+import asyncio
+import sqlite3
+import time
+import pytest
+from app.core.config import settings
+from app.core.rate_limit import RateLimited
+from app.services.task_executor import TaskType
+from app.services.task_queue import QueuedTask, TaskQueue, TaskStore
+
+
+class FakeExecutor:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    async def execute_task(self, task_type, params, process_pool=None):
+        await asyncio.sleep(self.delay)
+        return {
+            "status": "success",
+            "task_type": task_type.value,
+            "result": {"message": params["command"]}
+        }
+
+
+class Deliveries:
+    def __init__(self):
+        self.results = []
+
+    async def __call__(self, user_id, result):
+        self.results.append(result)
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TASK_RECOVERY_INTERVAL", 0.02)
+    monkeypatch.setattr(settings, "TASK_OWNER_TIMEOUT", 0.5)
+    return str(tmp_path / "task_queue.db")
+
+
+def queued_task(command="search"):
+    return QueuedTask(TaskType.WEB_SEARCH, {"command": command}, 1, time.time() + 20)
+
+
+def test_only_tasks_of_silent_owners_are_claimed(store_path):
+    first, second, third = (TaskStore(store_path, owner) for owner in ("a", "b", "c"))
+    task = queued_task()
+    first.add(task)
+
+    assert second.claim_abandoned(owner_timeout=30) == []
+
+    time.sleep(0.01)
+    claimed = second.claim_abandoned(owner_timeout=0)
+    assert [t.id for t in claimed] == [task.id]
+    # The new owner's heartbeat is fresh, so nobody else takes it
+    assert third.claim_abandoned(owner_timeout=30) == []
+    # The previous owner lost the row
+    assert not first.set_status(task.id, "done")
+    assert second.set_status(task.id, "done")
+
+
+def test_released_tasks_are_claimed_at_once(store_path):
+    first, second = TaskStore(store_path, "a"), TaskStore(store_path, "b")
+    task = queued_task()
+    first.add(task)
+    first.release()
+    assert [t.id for t in second.claim_abandoned(owner_timeout=30)] == [task.id]
+
+
+def test_backlogged_task_expires_instead_of_being_recovered(store_path):
+    async def scenario():
+        busy_deliveries, idle_deliveries = Deliveries(), Deliveries()
+        busy = TaskQueue(FakeExecutor(0.3), busy_deliveries, store_path, workers=1, process_workers=0)
+        idle = TaskQueue(FakeExecutor(), idle_deliveries, store_path, workers=1, process_workers=0)
+        await busy.start()
+        await idle.start()
+        try:
+            for _ in range(2):
+                await busy.submit(TaskType.WEB_SEARCH, {"command": "slow"}, 1)
+            late = await busy.submit(TaskType.WEB_SEARCH, {"command": "late"}, 1, timeout=0.1)
+            await asyncio.sleep(0.8)
+        finally:
+            await busy.stop()
+            await idle.stop()
+        return busy_deliveries.results, idle_deliveries.results, late
+
+    busy_results, idle_results, late = asyncio.run(scenario())
+    assert idle_results == []
+    assert [r["task_id"] for r in busy_results].count(late) == 1
+    late_result = next(r for r in busy_results if r["task_id"] == late)
+    assert late_result["error"] == "Task deadline exceeded"
+
+
+def test_stopped_queue_hands_tasks_to_the_next_worker(store_path):
+    async def scenario():
+        deliveries = Deliveries()
+        first = TaskQueue(FakeExecutor(5), Deliveries(), store_path, workers=1, process_workers=0)
+        task_id = await first.submit(TaskType.WEB_SEARCH, {"command": "slow"}, 1)
+        await asyncio.sleep(0.05)
+        await first.stop()
+
+        second = TaskQueue(FakeExecutor(), deliveries, store_path, workers=1, process_workers=0)
+        await second.start()
+        await asyncio.sleep(0.1)
+        await second.stop()
+        return deliveries.results, task_id
+
+    results, task_id = asyncio.run(scenario())
+    assert [r["task_id"] for r in results] == [task_id]
+
+
+def test_worker_survives_store_errors(store_path):
+    async def scenario():
+        deliveries = Deliveries()
+        queue = TaskQueue(FakeExecutor(), deliveries, store_path, workers=1, process_workers=0)
+        await queue.start()
+        set_status = queue.store.set_status
+        failures = [sqlite3.OperationalError("database is locked")]
+
+        def flaky_set_status(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return set_status(*args, **kwargs)
+
+        queue.store.set_status = flaky_set_status
+        try:
+            await queue.submit(TaskType.WEB_SEARCH, {"command": "first"}, 1)
+            second = await queue.submit(TaskType.WEB_SEARCH, {"command": "second"}, 1)
+            await asyncio.sleep(0.1)
+        finally:
+            await queue.stop()
+        return deliveries.results, second
+
+    results, second = asyncio.run(scenario())
+    assert [r["task_id"] for r in results] == [second]
+
+
+class BusyExecutor:
+    async def execute_task(self, task_type, params, process_pool=None):
+        raise RateLimited("mqtt", 0.5)
+
+
+def test_run_raises_rate_limited_for_a_busy_reply(store_path):
+    async def scenario():
+        queue = TaskQueue(BusyExecutor(), None, store_path, workers=1, process_workers=0)
+        try:
+            with pytest.raises(RateLimited):
+                await queue.run(TaskType.SMART_HOME, {"command": "turn on the light"}, 1)
+            assert queue.tasks == {}
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,93 @@
+"""
+Frame encoding and send coalescing of the WebSocket protocol.
+
+Usage (from backend/):
+    python -m pytest tests
+"""
+import asyncio
+import pytest
+from app.core.config import settings
+from app.core.ws_protocol import ProtocolSocket, WireProtocol, format_available
+
+
+class FakeWebSocket:
+    def __init__(self, fail_after=None):
+        self.frames = []
+        self.fail_after = fail_after
+        self.release = asyncio.Event()
+
+    async def send_text(self, text):
+        await self._send(text)
+
+    async def send_bytes(self, data):
+        await self._send(data)
+
+    async def _send(self, frame):
+        # Hold the first frame so other senders queue behind it
+        if not self.frames:
+            self.frames.append(frame)
+            await self.release.wait()
+            return
+        if self.fail_after is not None and len(self.frames) >= self.fail_after:
+            raise ConnectionError("connection reset")
+        self.frames.append(frame)
+
+
+@pytest.mark.parametrize("wire_format,compress", [
+    ("json", False),
+    ("json", True),
+    ("msgpack", False),
+    ("msgpack", True)
+])
+def test_encode_reports_bytes_on_the_wire(wire_format, compress, monkeypatch):
+    if not format_available(wire_format):
+        pytest.skip(f"{wire_format} not installed")
+    monkeypatch.setattr(settings, "WS_COMPRESSION_THRESHOLD", 0)
+    protocol = WireProtocol(wire_format, compress, batching=True)
+    message = {"type": "message", "content": {"text": "héllo wörld " * 10}}
+
+    text, data, size = protocol.encode(message)
+
+    assert size == (len(text.encode()) if text is not None else len(data))
+    assert protocol.decode(text, data) == message
+
+
+def test_waiting_messages_go_out_as_one_batch():
+    async def scenario():
+        websocket = FakeWebSocket()
+        socket = ProtocolSocket(websocket, WireProtocol(batching=True))
+        first = asyncio.ensure_future(socket.send({"n": 0}))
+        await asyncio.sleep(0)
+        await socket.send({"n": 1})
+        await socket.send({"n": 2})
+        websocket.release.set()
+        await first
+        return websocket.frames
+
+    frames = asyncio.run(scenario())
+
+    protocol = WireProtocol(batching=True)
+    assert [protocol.decode(frame, None) for frame in frames] == [
+        {"n": 0},
+        {"type": "batch", "messages": [{"n": 1}, {"n": 2}]}
+    ]
+
+
+def test_failed_batch_logs_the_dropped_messages(capsys):
+    async def scenario():
+        websocket = FakeWebSocket(fail_after=1)
+        socket = ProtocolSocket(websocket, WireProtocol(batching=True))
+        first = asyncio.ensure_future(socket.send({"n": 0}))
+        await asyncio.sleep(0)
+        await socket.send({"n": 1})
+        await socket.send({"n": 2})
+        websocket.release.set()
+        with pytest.raises(ConnectionError):
+            await first
+        return socket
+
+    socket = asyncio.run(scenario())
+
+    assert socket.pending == []
+    assert not socket._sending
+    assert "dropped 2 messages" in capsys.readouterr().out